@@ -0,0 +1,203 @@
+"""Multi-tenant agent host — runs many sandboxes' agent loops in one process.
+
+Instead of one VM and one interpreter per sandbox, a host takes a list of
+sandbox configs and runs each ``run_agent`` coroutine on a single event loop.
+SDK clients and HTTP connection pools are created once and shared; loop
+state, credits and conversation history stay local to each ``run_agent``
+call. Log records are tagged with the sandbox they came from and can be
+split into one file per sandbox.
+
+Usage:
+    python agent_host.py --configs sandbox_a.json sandbox_b.json
+    python agent_host.py --config-list sandboxes.json --log-dir logs/
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+from hedging import HedgePolicy
+from model_router import ModelRouter
+from tracing import init_tracing
+
+logger = logging.getLogger(__name__)
+
+current_sandbox_id: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_sandbox_id", default="-",
+)
+
+
+class SandboxLogFilter(logging.Filter):
+    """Tag log records with the sandbox whose task emitted them.
+
+    With ``sandbox_id`` set, only records from that sandbox pass — used for
+    per-sandbox log files.
+    """
+
+    def __init__(self, sandbox_id: str | None = None):
+        super().__init__()
+        self.sandbox_id = sandbox_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.sandbox_id = current_sandbox_id.get()
+        return self.sandbox_id is None or record.sandbox_id == self.sandbox_id
+
+
+class SharedResources:
+    """Clients shared by every agent on this host.
+
+    Each SDK client is built once. Clients that fail to initialize are left
+    as None, and the tools then fall back to building their own.
+    """
+
+    def __init__(self, max_connections: int = 200, max_hedges: int = 8):
+        self.router = ModelRouter()
+        # One hedge budget for the whole host, so hedging cost doesn't grow
+        # with the number of agents.
+        self.hedge = HedgePolicy(max_in_flight=max_hedges)
+        self.http = httpx.AsyncClient(
+            timeout=15.0,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections // 4,
+            ),
+        )
+        self.browser_client = _try_build("Browser Use", _build_browser_client)
+        self.mail_client = _try_build("AgentMail", _build_mail_client)
+        self.memory_client = _try_build("Supermemory", _build_memory_client)
+        self.locus_client = _try_build("Locus", _build_locus_client)
+
+    async def close(self) -> None:
+        await self.http.aclose()
+        if self.locus_client is not None:
+            await self.locus_client.aclose()
+        if self.browser_client is not None:
+            try:
+                await self.browser_client.close()
+            except Exception:
+                pass
+
+
+def _try_build(name: str, factory):
+    try:
+        return factory()
+    except Exception as e:
+        logger.warning("Shared %s client unavailable (%s) — agents will build their own", name, e)
+        return None
+
+
+def _build_browser_client():
+    from browser_use_sdk.v3 import AsyncBrowserUse
+    return AsyncBrowserUse(api_key=os.environ.get("BROWSER_USE_API_KEY", ""))
+
+
+def _build_mail_client():
+    from agentmail import AsyncAgentMail
+    return AsyncAgentMail(api_key=os.environ.get("AGENTMAIL_API_KEY", ""))
+
+
+def _build_memory_client():
+    from supermemory import Supermemory
+    return Supermemory(api_key=os.environ.get("SUPERMEMORY_API_KEY", ""))
+
+
+def _build_locus_client():
+    from tools.payments import make_locus_client
+    api_key = os.environ.get("LOCUS_API_KEY", "")
+    return make_locus_client(api_key) if api_key else None
+
+
+async def run_host(
+    configs: list[dict],
+    max_concurrent: int = 50,
+    start_interval: float = 0.2,
+    log_dir: str | None = None,
+) -> dict[str, str]:
+    """Run every config's agent loop concurrently. Returns sandbox_id -> outcome.
+
+    At most ``max_concurrent`` agents run at once. Starts are spaced
+    ``start_interval`` seconds apart so session creation doesn't burst.
+    """
+    from agent_runner import _get_bridge, run_agent
+
+    await asyncio.to_thread(init_tracing)
+
+    shared = SharedResources()
+    slots = asyncio.Semaphore(max_concurrent)
+    handlers: list[logging.Handler] = []
+
+    async def _run_one(index: int, config: dict) -> str:
+        sandbox_id = config["sandbox_id"]
+        current_sandbox_id.set(sandbox_id)
+        await asyncio.sleep(index * start_interval)
+        async with slots:
+            logger.info("Starting agent for sandbox %s", sandbox_id)
+            try:
+                await run_agent(config, shared=shared)
+                return "finished"
+            except Exception as e:
+                logger.exception("Agent for sandbox %s crashed", sandbox_id)
+                return f"crashed: {e}"
+
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        for config in configs:
+            handler = logging.FileHandler(os.path.join(log_dir, f"{config['sandbox_id']}.log"))
+            handler.addFilter(SandboxLogFilter(config["sandbox_id"]))
+            handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+            logging.getLogger().addHandler(handler)
+            handlers.append(handler)
+
+    try:
+        outcomes = await asyncio.gather(
+            *(_run_one(i, config) for i, config in enumerate(configs))
+        )
+    finally:
+        await shared.close()
+        bridge = _get_bridge()
+        if bridge is not None:
+            await bridge.close()
+        for handler in handlers:
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+
+    return {config["sandbox_id"]: outcome for config, outcome in zip(configs, outcomes)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    load_dotenv()
+
+    handler = logging.StreamHandler()
+    handler.addFilter(SandboxLogFilter())
+    handler.setFormatter(logging.Formatter(
+        "%(asctime)s [%(sandbox_id)s] %(name)s %(levelname)s %(message)s"
+    ))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configs", nargs="*", default=[], help="Paths to sandbox config JSON files")
+    parser.add_argument("--config-list", help="Path to a JSON file holding a list of sandbox configs")
+    parser.add_argument("--max-concurrent", type=int, default=50)
+    parser.add_argument("--log-dir", help="Also write one log file per sandbox into this directory")
+    args = parser.parse_args()
+
+    configs: list[dict] = []
+    for path in args.configs:
+        with open(path) as f:
+            configs.append(json.load(f))
+    if args.config_list:
+        with open(args.config_list) as f:
+            configs.extend(json.load(f))
+    if not configs:
+        parser.error("Pass --configs and/or --config-list")
+
+    results = asyncio.run(run_host(configs, max_concurrent=args.max_concurrent, log_dir=args.log_dir))
+    for sandbox_id, outcome in results.items():
+        logger.info("Sandbox %s: %s", sandbox_id, outcome)
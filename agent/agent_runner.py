@@ -5,32 +5,59 @@ fallback on rate limits, and constraint enforcement.
 """
 
 import asyncio
+import contextlib
 import json
 import logging
 import os
 import sys
 import time
+from typing import Any
 
 from dotenv import load_dotenv
 load_dotenv()
 
-from lmnr import Laminar, observe
-
-from base import Decision
-from model_router import ModelRouter
+from base import BaseProvider, Decision, ToolCall
+from cassette import Cassette, OfflineResources, ReplayBridge
+from checkpoint import Checkpointer
+from deadline import DEFAULT_TOOL_TIMEOUT, THINK_TIMEOUT, TOOL_TIMEOUTS, Deadline
+from model_router import CascadePolicy, ModelRouter
 from tools.browser import BrowserTool
 from tools.email import EmailTool
 from tools.payments import PaymentsTool
 from goal_verifier import GoalVerifier
+from hedging import HedgePolicy
+from history import HistoryTrimmer, message_text
+from loop_detector import LoopDetector
 from memory import AgentMemory
+from metrics import StepMetrics
+from pacing import StepPacer, is_rate_limit_error
+from planning import execute_plan, parse_plan
+from pricing import COMPUTE_PHASES, CostLedger, result_cost, token_cost
 from prompts import build_user_prompt
+from results import ResultCompactor, ResultStore
+from streaming import ReasoningStream
+from summary import EpisodeSummarizer
+from tracing import init_tracing, observe
 
 logger = logging.getLogger(__name__)
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "orchestrator"))
 
 _bridge = None
-MAX_MESSAGES = 40
+
+# Max concurrent calls per tool within one sandbox. The browser tool drives a
+# single Browser Use session and payments must not race each other.
+TOOL_CONCURRENCY: dict[str, int] = {
+    "browser_task": 1,
+    "send_email": 4,
+    "send_usdc": 1,
+    "send_usdc_email": 1,
+}
+
+# Tools that may start while the LLM response is still streaming. Emails and
+# payments wait for the complete decision.
+EARLY_DISPATCH_TOOLS = frozenset({"browser_task"})
+PAYMENT_TOOLS = frozenset({"send_usdc", "send_usdc_email"})
 
 
 def _get_bridge():
@@ -43,33 +70,17 @@ def _get_bridge():
     convex_key = os.environ.get("CONVEX_DEPLOY_KEY")
     if convex_url and convex_key:
         try:
-            from event_bridge import EventBridge
-            _bridge = EventBridge(convex_url, convex_key)
+            from event_bridge import BufferedEventBridge
+            _bridge = BufferedEventBridge(
+                convex_url, convex_key,
+                flush_interval=float(os.environ.get("CONVEX_FLUSH_INTERVAL", "0.5")),
+            )
             logger.info("EventBridge connected to %s", convex_url)
         except ImportError:
             logger.warning("event_bridge module not available, using mock")
     return _bridge
 
 
-def _detect_loop(recent_actions: list[dict], window: int = 3) -> str | None:
-    """Check if the agent is stuck repeating the same action."""
-    if len(recent_actions) < window:
-        return None
-    last_n = recent_actions[-window:]
-    types = [a.get("action_type") for a in last_n]
-    tasks = [str(a.get("action", {}).get("task", "")) for a in last_n]
-    if len(set(types)) == 1 and len(set(tasks)) == 1:
-        return "You appear stuck repeating the same action. Try a completely different approach or strategy."
-    return None
-
-
-def _trim_messages(messages: list[dict], max_len: int = MAX_MESSAGES) -> list[dict]:
-    """Keep conversation within context window limits."""
-    if len(messages) <= max_len:
-        return messages
-    return [messages[0]] + messages[-(max_len - 1):]
-
-
 def _is_constrained(action_type: str, constraints: list[str]) -> str | None:
     """Return a block reason if the action violates a constraint, else None."""
     constraint_text = " ".join(constraints).lower()
@@ -84,38 +95,140 @@ def _is_constrained(action_type: str, constraints: list[str]) -> str | None:
     return None
 
 
-async def run_agent(sandbox_config: dict):
-    if os.environ.get("LMNR_PROJECT_API_KEY"):
-        Laminar.initialize()
-        logger.info("Laminar tracing initialized")
+async def run_agent(
+    sandbox_config: dict,
+    shared=None,
+    resume: bool = False,
+    cassette: Cassette | None = None,
+):
+    """Run one sandbox's agent loop until the goal, credits or time run out.
+
+    ``shared`` is an ``agent_host.SharedResources`` when several agents run in
+    one process; it supplies the router and SDK clients so connection pools
+    and provider clients are reused. All loop state stays local to this call.
+
+    Startup work overlaps: tracing init and browser session creation run in
+    the background during the first context gather and LLM call.
+
+    Loop state is checkpointed every step. With ``resume``, the last
+    checkpoint is restored and the agent reattaches to its browser session.
+
+    With a ``cassette`` all external I/O is recorded to it, or replayed from
+    it offline.
+    """
+    run_started = time.monotonic()
+    replaying = cassette is not None and cassette.replaying
+    if replaying and shared is None:
+        shared = OfflineResources(cassette)
+    if shared is None:
+        asyncio.get_running_loop().run_in_executor(None, init_tracing)
 
-    router = ModelRouter()
+    router = shared.router if shared is not None else ModelRouter()
     fallback_chain = router.get_fallback_chain(sandbox_config["model"])
 
-    browser = BrowserTool()
-    mail = EmailTool(inbox_id=sandbox_config.get("agentmail_inbox_id", ""))
-    payments = PaymentsTool()
-    memory = AgentMemory(api_key=os.environ.get("SUPERMEMORY_API_KEY", ""))
-    verifier = GoalVerifier(sandbox_config, payments_tool=payments, email_tool=mail)
+    summarizer = None
+    if sandbox_config.get("summarize_history", False):
+        summary_chain = router.get_cascade_chain(sandbox_config.get("summary_model", "gemini-2-flash"))
+        summarizer = EpisodeSummarizer((summary_chain or fallback_chain)[0])
+    trimmer = HistoryTrimmer(
+        count_tokens=fallback_chain[0].count_tokens,
+        context_window=min(p.context_window for p in fallback_chain),
+        fraction=sandbox_config.get("context_budget_fraction", 0.5),
+        on_evict=summarizer.evict if summarizer is not None else None,
+        chars_per_token=fallback_chain[0].chars_per_token,
+    )
+
+    browser, mail, payments, memory, verifier = _build_tools(sandbox_config, shared)
+    if cassette is not None:
+        _attach_cassette(cassette, router, browser, mail, payments, memory, verifier)
+    tool_limits = _tool_limits()
+    hedge = None
+    if sandbox_config.get("hedge_requests", False):
+        hedge = shared.hedge if shared is not None else HedgePolicy(
+            max_in_flight=sandbox_config.get("max_hedges", 1),
+        )
+    pacer = StepPacer(
+        # A fast replay has no rate limits or spectators to pace for.
+        max_delay=0.0 if replaying and cassette.speed == 0 else sandbox_config.get("max_step_delay", 30.0),
+    )
+    metrics = StepMetrics(
+        sandbox_config["sandbox_id"],
+        emit_interval=sandbox_config.get("metrics_interval", 60.0),
+        dump_path=sandbox_config.get("metrics_path"),
+    )
 
     sandbox_id = sandbox_config["sandbox_id"]
     goal = sandbox_config["goal"]
     credits = sandbox_config.get("initial_credits", 50)
+    # Credits are priced in USD (1 credit = $1 unless configured otherwise).
+    usd_per_credit = sandbox_config.get("usd_per_credit", 1.0)
+    ledger = CostLedger(budget_usd=credits * usd_per_credit)
+    projected_step_usd = 0.0
     constraints = sandbox_config.get("constraints", [])
+    goal_type = sandbox_config.get("goal_type", "general")
+    pipelined = bool(sandbox_config.get("pipeline_steps", False))
+    cascade = CascadePolicy.from_config(sandbox_config)
+    # Plan mode: up to this many tool calls per think call (0 = off).
+    max_plan_steps = int(sandbox_config.get("max_plan_steps", 5)) if sandbox_config.get("plan_mode", False) else 0
+    stream_reasoning = bool(sandbox_config.get("stream_reasoning", False))
     recent_actions: list[dict] = []
+    loops = LoopDetector()
     messages: list[dict] = []
+    prefetch_task: asyncio.Task | None = None
+    next_context: dict | None = None
+    time_to_first_action: float | None = None
 
-    await browser.create_session()
+    checkpointer = Checkpointer(
+        sandbox_config.get("checkpoint_path")
+        or os.environ.get("AGENT_CHECKPOINT_PATH", f"checkpoint-{sandbox_id}.jsonl"),
+    )
+    restored = checkpointer.load() if resume else None
+    result_store = ResultStore(
+        sandbox_config.get("result_store_path")
+        or os.environ.get("AGENT_RESULT_STORE", f"results-{sandbox_id}"),
+    )
+    compactor = ResultCompactor(result_store, chars_per_token=fallback_chain[0].chars_per_token)
+    if restored is not None:
+        messages = restored["messages"]
+        if summarizer is not None:
+            summarizer.restore(messages)
+        if "ledger" in restored:
+            ledger.entries = restored["ledger"]
+        else:
+            # Checkpoint from before per-phase pricing: carry the total over as think spend.
+            ledger.charge("think", (credits - restored["credits"]) * usd_per_credit)
+        credits = ledger.remaining / usd_per_credit
+        recent_actions = restored["recent_actions"]
+        for action in recent_actions:
+            loops.record(action["action_type"], action["action"], action["result"])
+        verifier.start_time = restored["start_time"]
+        verifier._current_progress = restored.get("progress", 0)
+        logger.info(
+            "Resumed from checkpoint: %d messages, %.1f credits, %.0fs elapsed",
+            len(messages), credits, verifier.elapsed_seconds,
+        )
+    else:
+        if resume:
+            logger.warning("No usable checkpoint at %s — starting fresh", checkpointer.path)
+        checkpointer.reset()
+        result_store.clear()
+
+    session_task = browser.start_session(
+        resume_id=restored.get("session_id") if restored is not None else None,
+    )
 
     bridge = _get_bridge()
 
     _live_url_pushed = False
-    if browser.live_url:
-        await _push_live_url(sandbox_id, browser.live_url, "")
-        _live_url_pushed = True
 
     async def _poll_live_url():
         nonlocal _live_url_pushed
+        with contextlib.suppress(Exception):
+            await session_task
+        if browser.live_url:
+            await _push_live_url(sandbox_id, browser.live_url, "")
+            _live_url_pushed = True
+            return
         for _ in range(30):
             await asyncio.sleep(2)
             if _live_url_pushed:
@@ -133,224 +246,772 @@ async def run_agent(sandbox_config: dict):
 
     live_url_task = asyncio.create_task(_poll_live_url())
 
+    def _mark_first_action() -> None:
+        nonlocal time_to_first_action
+        if time_to_first_action is None:
+            time_to_first_action = time.monotonic() - run_started
+            metrics.record("time_to_first_action", time_to_first_action)
+            logger.info("Time to first action: %.2fs", time_to_first_action)
+
+    def _dispatch_early(call: ToolCall) -> asyncio.Task | None:
+        if call.name not in EARLY_DISPATCH_TOOLS:
+            return None
+        _mark_first_action()
+        return asyncio.create_task(_run_tool_call(
+            call, "", browser, mail, payments, sandbox_id,
+            constraints, tool_limits, metrics, loops, compactor, deadline,
+        ))
+
+    deadline = Deadline(
+        verifier.remaining_seconds,
+        grace=sandbox_config.get("completion_grace", 15.0),
+    )
+    stream: ReasoningStream | None = None
+    completed = False
     try:
-        while credits > 0 and not verifier.goal_achieved and not verifier.time_expired:
-            emails_task = mail.check_inbox()
-            balance_task = payments.get_balance()
-            prompts_task = _fetch_pending_prompts(sandbox_id)
-            memory_task = memory.search(
-                query=f"strategies for {sandbox_config.get('goal_type', 'general')}",
-                sandbox_id=sandbox_id,
-            )
-
-            emails, balance, user_prompts, past_context = await asyncio.gather(
-                emails_task, balance_task, prompts_task, memory_task,
-                return_exceptions=True,
-            )
+        async with deadline.scope():
+            while credits > 0 and not verifier.goal_achieved and not verifier.time_expired:
+                if ledger.remaining < projected_step_usd:
+                    logger.info(
+                        "Stopping: $%.4f left is under the projected step cost of $%.4f",
+                        ledger.remaining, projected_step_usd,
+                    )
+                    break
+                step_started = time.monotonic()
+                if next_context is not None:
+                    step_context, next_context = next_context, None
+                else:
+                    with metrics.phase("gather"):
+                        step_context = await _gather_context(mail, payments, memory, sandbox_id, goal_type)
+                emails = step_context["emails"]
+                balance = step_context["balance"]
+                user_prompts = step_context["user_prompts"]
+                past_context = step_context["past_context"]
+
+                for prompt_data in user_prompts:
+                    await memory.add_user_prompt(
+                        prompt=prompt_data.get("promptText", ""),
+                        sandbox_id=sandbox_id,
+                    )
+                    prompt_id = prompt_data.get("_id", "")
+                    if prompt_id and bridge:
+                        try:
+                            await bridge.acknowledge_prompt(prompt_id)
+                        except Exception as e:
+                            logger.warning("Failed to acknowledge prompt %s: %s", prompt_id, e)
+
+                stuck_hint = loops.hint()
+
+                user_prompt = build_user_prompt(
+                    goal,
+                    wallet_balance=balance,
+                    emails=emails,
+                    memory=past_context,
+                    user_prompts=user_prompts,
+                    action_history=recent_actions,
+                    stuck_hint=stuck_hint,
+                    constraints=constraints,
+                    time_remaining_seconds=verifier.remaining_seconds,
+                    current_progress=verifier._current_progress,
+                    plan_steps=max_plan_steps,
+                )
+                messages.append({"role": "user", "content": user_prompt})
+                if summarizer is not None:
+                    # Picks up any summary update that finished since the last step.
+                    messages = summarizer.apply(messages)
+
+                with metrics.phase("push_event", event="thinking"):
+                    await _push_event(sandbox_id, {
+                        "step": len(recent_actions) + 1,
+                        "status": "thinking",
+                    }, event_type="status")
+
+                stream = None
+                if stream_reasoning:
+                    step = len(recent_actions) + 1
+                    stream = ReasoningStream(
+                        publish=lambda text, step=step: _push_event(
+                            sandbox_id, {"step": step, "thought": text}, event_type="thinking",
+                        ),
+                        # A cheap-model decision may be thrown away, so don't act on it early.
+                        dispatch=_dispatch_early if cascade is None else None,
+                    )
+
+                with metrics.phase("think"):
+                    decision, escalated_cost = None, 0.0
+                    if cascade is not None:
+                        decision, escalated_cost = await _think_step_cascaded(
+                            cascade, router, messages, loops,
+                            pacer=pacer, metrics=metrics, stream=stream, plan=bool(max_plan_steps),
+                            timeout=deadline.timeout(THINK_TIMEOUT),
+                        )
+                    if decision is None:
+                        if stream is not None:
+                            stream.dispatch = _dispatch_early
+                        decision = await _think_step_with_fallback(
+                            router.get_fallback_chain(sandbox_config["model"]), messages,
+                            pacer=pacer, metrics=metrics, stream=stream, hedge=hedge, router=router,
+                            plan=bool(max_plan_steps), timeout=deadline.timeout(THINK_TIMEOUT),
+                        )
+                        # The discarded cheap attempt was still billed.
+                        decision.cost += escalated_cost
+
+                if decision.raw_assistant_message:
+                    messages.append(decision.raw_assistant_message)
+                calls = decision.calls()
+                if stream is not None:
+                    stream.cancel_unclaimed({c.id for c in calls})
+
+                _mark_first_action()
+                status = {
+                    "step": len(recent_actions) + 1,
+                    "status": "executing",
+                    "action_type": decision.action_type,
+                    "action_summary": str(decision.action.get("task", decision.action))[:120] if isinstance(decision.action, dict) else str(decision.action)[:120],
+                    "tool_count": len(calls),
+                }
+                if not recent_actions:
+                    status["time_to_first_action"] = round(time_to_first_action, 2)
+                with metrics.phase("push_event", event="executing"):
+                    await _push_event(sandbox_id, status, event_type="status")
+
+                if pipelined and any(not _is_constrained(c.name, constraints) for c in calls):
+                    # Gather step N+1's context while step N's actions run.
+                    prefetch_task = asyncio.create_task(
+                        _gather_context(mail, payments, memory, sandbox_id, goal_type)
+                    )
+                plan_call = next((c for c in calls if c.name == "submit_plan"), None) if max_plan_steps else None
+                # A transfer in flight must finish and be recorded before the deadline may cancel.
+                holding = _moves_funds(calls)
+                if holding:
+                    deadline.hold()
+                if plan_call is None:
+                    results = await _execute_tool_calls(
+                        calls, decision.reasoning, browser, mail, payments, sandbox_id,
+                        constraints, tool_limits, metrics, stream, loops, compactor, deadline,
+                    )
+                    # What the model, history, memory and spectators see; full results stay in the store.
+                    executed = [
+                        (call, result, compactor.compact(call.name, result))
+                        for call, result in zip(calls, results)
+                    ]
+                    turn_results = {call.id: compact for call, _, compact in executed}
+                else:
+                    executed, turn_results = await _execute_plan_turn(
+                        calls, plan_call, max_plan_steps, decision.reasoning,
+                        browser, mail, payments, sandbox_id, constraints, tool_limits,
+                        metrics, stream, loops, compactor, verifier, deadline,
+                    )
+
+                tool_results = [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": call.id,
+                        "content": json.dumps(turn_results[call.id], default=str),
+                    }
+                    for call in calls
+                    if call.id
+                ]
+                if tool_results:
+                    messages.append({"role": "user", "content": tool_results})
+
+                messages = trimmer.trim(messages)
+
+                if browser.live_url and not _live_url_pushed:
+                    await _push_live_url(sandbox_id, browser.live_url, "")
+                    _live_url_pushed = True
 
-            if isinstance(emails, BaseException):
-                logger.warning("check_inbox failed: %s", emails)
-                emails = []
-            if isinstance(balance, BaseException):
-                logger.warning("get_balance failed: %s", balance)
-                balance = 0.0
-            if isinstance(user_prompts, BaseException):
-                logger.warning("fetch_prompts failed: %s", user_prompts)
-                user_prompts = []
-            if isinstance(past_context, BaseException):
-                logger.warning("memory search failed: %s", past_context)
-                past_context = []
-
-            for prompt_data in user_prompts:
-                await memory.add_user_prompt(
-                    prompt=prompt_data.get("promptText", ""),
-                    sandbox_id=sandbox_id,
+                memory_writes = asyncio.gather(*(
+                    memory.add(
+                        content=f"Action: {call.name} {call.input}, Result: {result}",
+                        sandbox_id=sandbox_id,
+                        goal_type=goal_type,
+                    )
+                    for call, _, result in executed
+                ))
+
+                spent_before = ledger.compute_spent
+                ledger.charge("think", decision.cost)
+                ledger.charge("hedge", decision.hedge_cost)
+                if summarizer is not None:
+                    ledger.charge("summary", summarizer.take_cost())
+                step_costs = {call.id: 0.0 for call, _, _ in executed}
+                step_costs[executed[0][0].id] = decision.cost + decision.hedge_cost
+                for call, result, _ in executed:
+                    charge = result_cost(call.name, call.input, result)
+                    if charge is not None:
+                        ledger.charge(*charge, label=call.name)
+                        if charge[0] in COMPUTE_PHASES:
+                            step_costs[call.id] += charge[1]
+                step_usd = ledger.compute_spent - spent_before
+                projected_step_usd = step_usd if not projected_step_usd else (
+                    0.3 * step_usd + 0.7 * projected_step_usd
                 )
-                prompt_id = prompt_data.get("_id", "")
-                if prompt_id and bridge:
+                credits = ledger.remaining / usd_per_credit
+
+                for call, _, result in executed:
+                    recent_actions.append({
+                        "action_type": call.name,
+                        "action": call.input,
+                        "result": result,
+                        "reasoning": decision.reasoning,
+                    })
+                    loops.record(call.name, call.input, result)
+                loops.end_step()
+                if len(recent_actions) > 20:
+                    recent_actions = recent_actions[-20:]
+
+                if prefetch_task is not None:
+                    _, progress, next_context = await asyncio.gather(
+                        metrics.timed("memory_add", memory_writes),
+                        metrics.timed("check_progress", verifier.check_progress()),
+                        metrics.timed("gather", _reconcile_context(
+                            prefetch_task, {c.name for c, _, _ in executed}, payments, sandbox_id,
+                        )),
+                    )
+                    prefetch_task = None
+                else:
+                    with metrics.phase("memory_add"):
+                        await memory_writes
+                    with metrics.phase("check_progress"):
+                        progress = await verifier.check_progress()
+
+                with metrics.phase("push_event", event="reasoning"):
+                    for call, _, result in executed:
+                        await _push_event(sandbox_id, {
+                            "reasoning": decision.reasoning,
+                            "action": call.input,
+                            "action_type": call.name,
+                            "result": result,
+                            "progress": progress,
+                            "credits_used": step_costs[call.id] / usd_per_credit,
+                        }, event_type="reasoning")
+
+                if bridge:
                     try:
-                        await bridge.acknowledge_prompt(prompt_id)
+                        with metrics.phase("update_progress"):
+                            await bridge.update_progress(sandbox_id, progress)
                     except Exception as e:
-                        logger.warning("Failed to acknowledge prompt %s: %s", prompt_id, e)
-
-            stuck_hint = _detect_loop(recent_actions)
-
-            user_prompt = build_user_prompt(
-                goal,
-                wallet_balance=balance,
-                emails=emails,
-                memory=past_context,
-                user_prompts=user_prompts,
-                action_history=recent_actions,
-                stuck_hint=stuck_hint,
-                constraints=constraints,
-                time_remaining_seconds=verifier.remaining_seconds,
-                current_progress=verifier._current_progress,
-            )
-            messages.append({"role": "user", "content": user_prompt})
-
-            await _push_event(sandbox_id, {
-                "step": len(recent_actions) + 1,
-                "status": "thinking",
-            }, event_type="status")
-
-            decision = await _think_step_with_fallback(fallback_chain, messages)
-
-            if decision.raw_assistant_message:
-                messages.append(decision.raw_assistant_message)
-
-            await _push_event(sandbox_id, {
-                "step": len(recent_actions) + 1,
-                "status": "executing",
-                "action_type": decision.action_type,
-                "action_summary": str(decision.action.get("task", decision.action))[:120] if isinstance(decision.action, dict) else str(decision.action)[:120],
-            }, event_type="status")
-
-            block_reason = _is_constrained(decision.action_type, constraints)
-            if block_reason:
-                logger.info("Constraint blocked: %s", block_reason)
-                result = {"status": "blocked", "error": block_reason}
-            else:
-                result = await _execute_action(decision, browser, mail, payments, sandbox_id)
-
-            if decision.tool_use_id:
-                messages.append({
-                    "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": decision.tool_use_id,
-                        "content": json.dumps(result, default=str)[:2000],
-                    }],
-                })
+                        logger.warning("Failed to update progress in Convex: %s", e)
+
+                with metrics.phase("push_event", event="cost"):
+                    await _push_event(sandbox_id, {
+                        "step_usd": round(step_usd, 6),
+                        "usage": decision.usage,
+                        **ledger.snapshot(),
+                    }, event_type="cost")
+
+                metrics.record("step", time.monotonic() - step_started)
+                with metrics.phase("checkpoint"):
+                    checkpointer.save(
+                        messages,
+                        credits=credits,
+                        ledger=ledger.entries,
+                        recent_actions=recent_actions,
+                        start_time=verifier.start_time,
+                        progress=progress,
+                        session_id=browser.session_id,
+                    )
+                if holding:
+                    deadline.release()
+                if metrics.due():
+                    await _emit_metrics(sandbox_id, metrics)
+
+                if any(c.name == "finish_reasoning" and c.input.get("should_stop") for c in calls):
+                    logger.info("Agent chose to stop (finish_reasoning with should_stop=True)")
+                    break
+
+                delay = pacer.next_delay(
+                    credits=credits,
+                    remaining_seconds=verifier.remaining_seconds,
+                    step_cost=step_usd / usd_per_credit,
+                    step_duration=time.monotonic() - step_started,
+                    action_type=calls[0].name if len(calls) == 1 else "",
+                )
+                seen_emails = {(e.get("thread_id"), str(e.get("timestamp"))) for e in emails}
+                woken = await pacer.sleep(
+                    delay,
+                    watcher=lambda p: _watch_for_input(p, mail, sandbox_id, seen_emails),
+                )
+                if woken:
+                    # New prompt or email — a prefetched context would miss it.
+                    next_context = None
+
+        # Settle before cleanup, so closing tools can't delay it. Until Convex
+        # confirms, the checkpoint stays, so --resume retries the settlement.
+        completed = bool(await deadline.bounded(
+            _complete_sandbox(sandbox_id, verifier.goal_achieved), "complete_sandbox", deadline.grace,
+        ))
+        if not completed:
+            logger.warning("Sandbox %s not settled — keeping its checkpoint for --resume", sandbox_id)
 
-            messages = _trim_messages(messages)
+    finally:
+        live_url_task.cancel()
+        if prefetch_task is not None:
+            prefetch_task.cancel()
+        if stream is not None:
+            stream.cancel_unclaimed(set())
+        closers = [browser.close(), verifier.close(), memory.close(), _emit_metrics(sandbox_id, metrics)]
+        if hasattr(payments, "close"):
+            closers.append(payments.close())
+        if summarizer is not None:
+            closers.append(summarizer.close())
+        await asyncio.gather(*(deadline.bounded(c, "shutdown") for c in closers))
+        if cascade is not None and cascade.steps:
+            logger.info("Cascade: %d steps tried on %s, %.0f%% escalated %s",
+                        cascade.steps, cascade.cheap_key, 100 * cascade.escalation_rate(),
+                        cascade.escalations)
+
+    if completed:
+        checkpointer.reset()
+        result_store.clear()
+    if cassette is not None:
+        cassette.close()
+
+
+def _build_tools(
+    sandbox_config: dict,
+    shared=None,
+) -> tuple[BrowserTool, EmailTool, PaymentsTool, AgentMemory, GoalVerifier]:
+    """Construct the per-sandbox tools, reusing shared SDK clients if given.
+
+    A ``shared`` object with a ``build_tools(sandbox_config)`` method supplies
+    the tools itself (used by the offline benchmark's mocks).
+    """
+    if shared is not None and hasattr(shared, "build_tools"):
+        return shared.build_tools(sandbox_config)
+    inbox_id = sandbox_config.get("agentmail_inbox_id", "")
+    if shared is None:
+        browser = BrowserTool()
+        mail = EmailTool(inbox_id=inbox_id)
+        payments = PaymentsTool()
+        memory = AgentMemory(api_key=os.environ.get("SUPERMEMORY_API_KEY", ""))
+        verifier = GoalVerifier(sandbox_config, payments_tool=payments, email_tool=mail)
+    else:
+        browser = BrowserTool(client=shared.browser_client)
+        mail = EmailTool(inbox_id=inbox_id, client=shared.mail_client)
+        payments = PaymentsTool(client=shared.locus_client)
+        memory = AgentMemory(client=shared.memory_client)
+        verifier = GoalVerifier(
+            sandbox_config, payments_tool=payments, email_tool=mail,
+            http_client=shared.http,
+        )
+    return browser, mail, payments, memory, verifier
+
+
+def _attach_cassette(
+    cassette: Cassette,
+    router: ModelRouter,
+    browser: BrowserTool,
+    mail: EmailTool,
+    payments: PaymentsTool,
+    memory: AgentMemory,
+    verifier: GoalVerifier,
+) -> None:
+    """Route the providers', tools' and bridge's I/O through ``cassette``."""
+    global _bridge
+    if not cassette.replaying:
+        cassette.attach_router(router)
+    for name, tool in (("browser", browser), ("mail", mail), ("payments", payments),
+                       ("memory", memory), ("verifier", verifier)):
+        cassette.attach(tool, name)
+    if cassette.replaying:
+        _bridge = ReplayBridge()
+        if cassette.recorded("bridge"):
+            cassette.attach(_bridge, "bridge")
+    elif _get_bridge() is not None:
+        cassette.attach(_bridge, "bridge")
+
+
+async def _gather_context(
+    mail: EmailTool,
+    payments: PaymentsTool,
+    memory: AgentMemory,
+    sandbox_id: str,
+    goal_type: str,
+) -> dict:
+    """Fetch inbox, balance, pending prompts and memory for the next step."""
+    emails, balance, user_prompts, past_context = await asyncio.gather(
+        mail.check_inbox(),
+        payments.get_balance(),
+        _fetch_pending_prompts(sandbox_id),
+        memory.search(query=f"strategies for {goal_type}", sandbox_id=sandbox_id),
+        return_exceptions=True,
+    )
 
-            if browser.live_url and not _live_url_pushed:
-                await _push_live_url(sandbox_id, browser.live_url, "")
-                _live_url_pushed = True
+    if isinstance(emails, BaseException):
+        logger.warning("check_inbox failed: %s", emails)
+        emails = []
+    if isinstance(balance, BaseException):
+        logger.warning("get_balance failed: %s", balance)
+        balance = 0.0
+    if isinstance(user_prompts, BaseException):
+        logger.warning("fetch_prompts failed: %s", user_prompts)
+        user_prompts = []
+    if isinstance(past_context, BaseException):
+        logger.warning("memory search failed: %s", past_context)
+        past_context = []
+
+    return {
+        "emails": emails,
+        "balance": balance,
+        "user_prompts": user_prompts,
+        "past_context": past_context,
+    }
+
+
+async def _reconcile_context(
+    prefetch_task: asyncio.Task,
+    action_types: set[str],
+    payments: PaymentsTool,
+    sandbox_id: str,
+) -> dict:
+    """Merge context that arrived after the prefetch into the prefetched result.
+
+    The prefetch starts when the action starts, so prompts submitted while a
+    long browser task was running would otherwise wait a full extra step, and
+    the balance is stale after a payment.
+    """
+    late_prompts_task = _fetch_pending_prompts(sandbox_id)
+    if action_types & {"send_usdc", "send_usdc_email"}:
+        balance_task = payments.get_balance()
+    else:
+        balance_task = asyncio.sleep(0, result=None)
+
+    step_context, late_prompts, balance = await asyncio.gather(
+        prefetch_task, late_prompts_task, balance_task,
+    )
 
-            await memory.add(
-                content=f"Action: {decision.action_type} {decision.action}, Result: {result}",
-                sandbox_id=sandbox_id,
-                goal_type=sandbox_config.get("goal_type", "general"),
-            )
+    seen = {p.get("_id") for p in step_context["user_prompts"]}
+    for prompt_data in late_prompts:
+        if prompt_data.get("_id") not in seen:
+            step_context["user_prompts"].append(prompt_data)
+    if balance is not None:
+        step_context["balance"] = balance
+    return step_context
 
-            recent_actions.append({
-                "action_type": decision.action_type,
-                "action": decision.action,
-                "result": result,
-                "reasoning": decision.reasoning,
-            })
-            if len(recent_actions) > 20:
-                recent_actions = recent_actions[-20:]
 
-            progress = await verifier.check_progress()
+def _tool_limits() -> dict[str, asyncio.Semaphore]:
+    """Per-sandbox semaphores capping concurrent calls of each tool."""
+    return {name: asyncio.Semaphore(limit) for name, limit in TOOL_CONCURRENCY.items()}
 
-            await _push_event(sandbox_id, {
-                "reasoning": decision.reasoning,
-                "action": decision.action,
-                "action_type": decision.action_type,
-                "result": result,
-                "progress": progress,
-                "credits_used": decision.cost,
-            }, event_type="reasoning")
 
-            if bridge:
-                try:
-                    await bridge.update_progress(sandbox_id, progress)
-                except Exception as e:
-                    logger.warning("Failed to update progress in Convex: %s", e)
+def _moves_funds(calls: list[ToolCall]) -> bool:
+    """True if any call (or step of a submitted plan) is a payment."""
+    for call in calls:
+        if call.name in PAYMENT_TOOLS:
+            return True
+        if call.name == "submit_plan" and isinstance(call.input.get("steps"), list):
+            if any(isinstance(s, dict) and s.get("tool") in PAYMENT_TOOLS for s in call.input["steps"]):
+                return True
+    return False
 
-            credits -= decision.cost
 
-            if (decision.action_type == "finish_reasoning"
-                    and decision.action.get("should_stop")):
-                logger.info("Agent chose to stop (finish_reasoning with should_stop=True)")
-                break
+async def _run_tool_call(
+    call: ToolCall,
+    reasoning: str,
+    browser: BrowserTool,
+    mail: EmailTool,
+    payments: PaymentsTool,
+    sandbox_id: str,
+    constraints: list[str],
+    limits: dict[str, asyncio.Semaphore],
+    metrics: StepMetrics | None = None,
+    loops: LoopDetector | None = None,
+    results: ResultCompactor | None = None,
+    deadline: Deadline | None = None,
+) -> dict:
+    """Run one tool call under its constraint and loop checks and concurrency limit.
+
+    With ``deadline``, the call gets its tool's timeout if that ends first.
+    """
+    block_reason = _is_constrained(call.name, constraints)
+    if block_reason:
+        logger.info("Constraint blocked: %s", block_reason)
+        return {"status": "blocked", "error": block_reason}
+    block_reason = loops.block_reason(call.name, call.input) if loops is not None else None
+    if block_reason:
+        logger.info("Loop blocked: %s", block_reason)
+        return {"status": "blocked", "error": block_reason}
+    limit = limits.get(call.name) or contextlib.nullcontext()
+    async with limit:
+        started = time.perf_counter()
+        timeout = None
+        if deadline is not None:
+            timeout = deadline.timeout(TOOL_TIMEOUTS.get(call.name, DEFAULT_TOOL_TIMEOUT))
+        try:
+            result = await asyncio.wait_for(
+                _execute_action(call, reasoning, browser, mail, payments, sandbox_id, results), timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.warning("%s timed out after %.0fs", call.name, timeout)
+            result = {"status": "error", "error": f"{call.name} timed out after {timeout:.0f}s"}
+        if metrics is not None:
+            metrics.record("execute", time.perf_counter() - started, action_type=call.name)
+        return result
 
-            await asyncio.sleep(1.0)
 
-    finally:
-        live_url_task.cancel()
-        await browser.close()
-        if hasattr(payments, "close"):
-            await payments.close()
+async def _execute_tool_calls(
+    calls: list[ToolCall],
+    reasoning: str,
+    browser: BrowserTool,
+    mail: EmailTool,
+    payments: PaymentsTool,
+    sandbox_id: str,
+    constraints: list[str],
+    limits: dict[str, asyncio.Semaphore],
+    metrics: StepMetrics | None = None,
+    stream: ReasoningStream | None = None,
+    loops: LoopDetector | None = None,
+    results: ResultCompactor | None = None,
+    deadline: Deadline | None = None,
+) -> list[dict]:
+    """Run every tool call from one turn concurrently, results in call order.
+
+    Calls already early-dispatched by ``stream`` are awaited, not rerun.
+    """
+
+    async def _run(call: ToolCall) -> dict:
+        early = stream.take(call.id) if stream is not None else None
+        if early is not None:
+            return await early
+        return await _run_tool_call(
+            call, reasoning, browser, mail, payments, sandbox_id, constraints, limits, metrics, loops,
+            results, deadline,
+        )
+
+    if len(calls) == 1:
+        return [await _run(calls[0])]
+    return list(await asyncio.gather(*(_run(call) for call in calls)))
+
+
+async def _execute_plan_turn(
+    calls: list[ToolCall],
+    plan_call: ToolCall,
+    max_steps: int,
+    reasoning: str,
+    browser: BrowserTool,
+    mail: EmailTool,
+    payments: PaymentsTool,
+    sandbox_id: str,
+    constraints: list[str],
+    limits: dict[str, asyncio.Semaphore],
+    metrics: StepMetrics,
+    stream: ReasoningStream | None,
+    loops: LoopDetector,
+    compactor: ResultCompactor,
+    verifier: GoalVerifier,
+    deadline: Deadline | None = None,
+) -> tuple[list[tuple[ToolCall, dict, Any]], dict[str, Any]]:
+    """Run a turn containing ``submit_plan``: its other calls, then the plan's steps.
+
+    Returns every executed (call, result, compacted result), plan steps
+    included, and the compacted result to report for each call in the turn.
+    """
+    others = [c for c in calls if c is not plan_call]
+    other_results = await _execute_tool_calls(
+        others, reasoning, browser, mail, payments, sandbox_id,
+        constraints, limits, metrics, stream, loops, compactor, deadline,
+    ) if others else []
+    executed = [(c, r, compactor.compact(c.name, r)) for c, r in zip(others, other_results)]
+    turn_results = {c.id: compact for c, _, compact in executed}
+
+    steps, error = parse_plan(plan_call, max_steps)
+    if error is not None:
+        plan_result: dict[str, Any] = {"status": "error", "error": error}
+        executed.append((plan_call, plan_result, plan_result))
+        turn_results[plan_call.id] = plan_result
+        return executed, turn_results
+
+    async def _interrupted() -> str | None:
+        if verifier.time_expired:
+            return "time ran out"
+        if await _fetch_pending_prompts(sandbox_id):
+            return "a user prompt arrived"
+        return None
 
-    success = verifier.goal_achieved
-    await _complete_sandbox(sandbox_id, success)
+    ran, stop_reason = await execute_plan(
+        steps,
+        lambda call: _run_tool_call(
+            call, reasoning, browser, mail, payments, sandbox_id,
+            constraints, limits, metrics, loops, compactor, deadline,
+        ),
+        _interrupted,
+    )
+    plan_steps = [(c, r, compactor.compact(c.name, r)) for c, r in ran]
+    executed.extend(plan_steps)
+    logger.info("Plan ran %d of %d steps in one think call", len(ran), len(steps))
+    turn_results[plan_call.id] = compactor.compact("submit_plan", {
+        "status": "completed" if stop_reason is None else "stopped",
+        "steps_run": len(ran),
+        "steps_planned": len(steps),
+        "stopped_because": stop_reason,
+        "results": [{"tool": c.name, "arguments": c.input, "result": compact} for c, _, compact in plan_steps],
+    })
+    return executed, turn_results
 
 
 async def _execute_action(
-    decision: Decision,
+    call: ToolCall,
+    reasoning: str,
     browser: BrowserTool,
     mail: EmailTool,
     payments: PaymentsTool,
     sandbox_id: str,
+    results: ResultCompactor | None = None,
 ) -> dict:
-    """Execute the tool call from the LLM's decision, with error handling."""
+    """Execute one tool call from the LLM's decision, with error handling."""
     try:
-        if decision.action_type == "browser_task":
-            return await browser.execute(decision.action)
+        if call.name == "browser_task":
+            return await browser.execute(call.input)
 
-        elif decision.action_type == "send_email":
-            result = await mail.send(decision.action)
+        elif call.name == "send_email":
+            result = await mail.send(call.input)
             await _push_event(sandbox_id, {
                 "type": "email",
                 "direction": "sent",
-                "to": decision.action.get("to", ""),
-                "subject": decision.action.get("subject", ""),
+                "to": call.input.get("to", ""),
+                "subject": call.input.get("subject", ""),
             }, event_type="email")
             return result
 
-        elif decision.action_type == "send_usdc":
-            result = await payments.send_usdc(decision.action)
+        elif call.name == "send_usdc":
+            result = await payments.send_usdc(call.input)
             await _push_event(sandbox_id, {
                 "type": "payment",
                 "method": "address",
-                "amount": decision.action.get("amount", 0),
-                "memo": decision.action.get("memo", ""),
-                "to_address": decision.action.get("to_address", ""),
+                "amount": call.input.get("amount", 0),
+                "memo": call.input.get("memo", ""),
+                "to_address": call.input.get("to_address", ""),
                 "status": result.get("status", ""),
             }, event_type="payment")
             return result
 
-        elif decision.action_type == "send_usdc_email":
-            result = await payments.send_usdc_email(decision.action)
+        elif call.name == "send_usdc_email":
+            result = await payments.send_usdc_email(call.input)
             await _push_event(sandbox_id, {
                 "type": "payment",
                 "method": "email",
-                "amount": decision.action.get("amount", 0),
-                "memo": decision.action.get("memo", ""),
-                "email": decision.action.get("email", ""),
+                "amount": call.input.get("amount", 0),
+                "memo": call.input.get("memo", ""),
+                "email": call.input.get("email", ""),
                 "status": result.get("status", ""),
             }, event_type="payment")
             return result
 
-        elif decision.action_type == "finish_reasoning":
-            return {"status": "reasoning_only", "reasoning": decision.reasoning}
+        elif call.name == "fetch_result":
+            if results is None:
+                return {"status": "error", "error": "No result store in this run"}
+            return results.fetch(call.input)
+
+        elif call.name == "finish_reasoning":
+            return {"status": "reasoning_only", "reasoning": reasoning}
 
         else:
-            return {"error": f"Unknown action type: {decision.action_type}"}
+            return {"error": f"Unknown action type: {call.name}"}
 
     except Exception as e:
-        logger.error("Action execution failed (%s): %s", decision.action_type, e)
+        logger.error("Action execution failed (%s): %s", call.name, e)
         return {"status": "error", "error": str(e)}
 
 
+async def _watch_for_input(
+    pacer: StepPacer,
+    mail: EmailTool,
+    sandbox_id: str,
+    seen_emails: set[tuple],
+    interval: float = 2.0,
+    inbox_every: int = 3,
+) -> None:
+    """Poll for user prompts (and, less often, new email) while the loop sleeps."""
+    polls = 0
+    while True:
+        await asyncio.sleep(interval)
+        polls += 1
+        if await _fetch_pending_prompts(sandbox_id):
+            pacer.wake()
+            return
+        if polls % inbox_every == 0:
+            emails = await mail.check_inbox()
+            if any((e.get("thread_id"), str(e.get("timestamp"))) not in seen_emails for e in emails):
+                pacer.wake()
+                return
+
+
 @observe(name="agent_reasoning_step")
 async def _think_step_with_fallback(
     fallback_chain,
     messages: list[dict],
+    pacer: StepPacer | None = None,
+    metrics: StepMetrics | None = None,
+    stream: ReasoningStream | None = None,
+    hedge: HedgePolicy | None = None,
+    router: ModelRouter | None = None,
+    plan: bool = False,
+    timeout: float | None = None,
 ) -> Decision:
-    """Try the primary provider, fall back to alternatives on failure."""
-    last_error = None
-    for provider in fallback_chain:
+    """Try the primary provider, fall back to alternatives on failure.
+
+    With ``hedge``, a slow provider is raced against the next one in the
+    chain instead of waiting for it to fail; what the losers spent is set
+    as the decision's ``hedge_cost``. Only the primary streams.
+    With ``plan``, providers also offer the ``submit_plan`` tool. A provider
+    that takes longer than ``timeout`` counts as failed.
+    """
+
+    finished: list[Decision] = []
+    abandoned: list[float] = []
+
+    async def _attempt(provider, is_primary: bool = True) -> Decision:
+        provider_name = type(provider).__name__
+        started = time.perf_counter()
         try:
-            return await provider.think(messages=messages)
+            decision = await asyncio.wait_for(
+                provider.think(messages=messages, stream=stream if is_primary else None, plan=plan),
+                timeout,
+            )
+        except asyncio.CancelledError:
+            if hedge is not None:
+                # A losing hedge; the provider has already billed the prompt it read.
+                abandoned.append(_prompt_cost(provider, messages))
+                if metrics is not None:
+                    metrics.record("think_provider", time.perf_counter() - started,
+                                   provider=provider_name, outcome="cancelled")
+            raise
         except Exception as e:
-            provider_name = type(provider).__name__
+            if metrics is not None:
+                metrics.record("think_provider", time.perf_counter() - started,
+                               provider=provider_name, outcome="error")
+            if router is not None:
+                router.record_failure(provider)
             logger.warning("Provider %s failed: %s — trying fallback", provider_name, e)
+            if pacer is not None and is_rate_limit_error(e):
+                pacer.record_rate_limit()
+            if stream is not None and is_primary:
+                stream.reset()
+            raise
+        latency = time.perf_counter() - started
+        if metrics is not None:
+            metrics.record("think_provider", latency, provider=provider_name, outcome="ok")
+        if router is not None:
+            router.record_success(provider, latency)
+        finished.append(decision)
+        return decision
+
+    last_error = None
+    if hedge is not None:
+        try:
+            decision = await hedge.race(fallback_chain, _attempt, metrics)
+            decision.hedge_cost = sum(d.cost for d in finished if d is not decision) + sum(abandoned)
+            return decision
+        except Exception as e:
             last_error = e
+    else:
+        for provider in fallback_chain:
+            try:
+                return await _attempt(provider)
+            except Exception as e:
+                last_error = e
 
     logger.error("All providers failed. Last error: %s", last_error)
     return Decision(
@@ -361,6 +1022,48 @@ async def _think_step_with_fallback(
     )
 
 
+def _prompt_cost(provider: BaseProvider, messages: list[dict]) -> float:
+    """Estimated USD for ``provider`` reading ``messages``, for requests cancelled before usage came back."""
+    tokens = sum(provider.count_tokens(message_text(m)) for m in messages)
+    return token_cost(getattr(provider, "model_id", ""), {"input_tokens": tokens}) or 0.0
+
+
+async def _think_step_cascaded(
+    cascade: CascadePolicy,
+    router: ModelRouter,
+    messages: list[dict],
+    loops: LoopDetector,
+    pacer: StepPacer | None = None,
+    metrics: StepMetrics | None = None,
+    stream: ReasoningStream | None = None,
+    plan: bool = False,
+    timeout: float | None = None,
+) -> tuple[Decision | None, float]:
+    """Ask the cascade's cheap model.
+
+    Returns the decision to use, or None with the cost of the discarded
+    attempt when the step must be escalated to the primary model.
+    """
+    chain = router.get_cascade_chain(cascade.cheap_key)
+    if not chain:
+        return None, 0.0
+    started = time.perf_counter()
+    decision = await _think_step_with_fallback(
+        chain, messages, pacer=pacer, metrics=metrics, stream=stream, router=router, plan=plan,
+        timeout=timeout,
+    )
+    reason = cascade.escalation_reason(decision, repeats=loops.repeats)
+    if metrics is not None:
+        metrics.record("think_cascade", time.perf_counter() - started,
+                       outcome="kept" if reason is None else "escalated")
+    if reason is None:
+        return decision, 0.0
+    logger.info("Escalating step to the primary model (%s)", reason)
+    if stream is not None:
+        stream.reset()
+    return None, decision.cost
+
+
 async def _push_live_url(sandbox_id: str, live_url: str, share_url: str) -> None:
     bridge = _get_bridge()
     if bridge:
@@ -392,16 +1095,30 @@ async def _push_event(sandbox_id: str, payload: dict, event_type: str = "reasoni
     logger.info("Event [%s] %s", event_type, json.dumps({"sandbox_id": sandbox_id, **payload}, default=str))
 
 
-async def _complete_sandbox(sandbox_id: str, success: bool):
+async def _emit_metrics(sandbox_id: str, metrics: StepMetrics) -> None:
+    """Push a metrics event, or write the snapshot locally without Convex."""
+    if _get_bridge():
+        await _push_event(sandbox_id, metrics.snapshot()["phases"], event_type="metrics")
+    else:
+        metrics.dump()
+
+
+async def _complete_sandbox(sandbox_id: str, success: bool, attempts: int = 3) -> bool:
+    """Settle the sandbox in Convex, retrying; True once it is settled (or there is no bridge)."""
     outcome = "success" if success else "failed"
     bridge = _get_bridge()
-    if bridge:
+    if not bridge:
+        logger.info("Sandbox completed: %s", json.dumps({"sandbox_id": sandbox_id, "outcome": outcome}))
+        return True
+    for attempt in range(attempts):
         try:
             await bridge.complete_sandbox(sandbox_id, outcome)
-            return
+            return True
         except Exception as e:
-            logger.warning("Failed to complete sandbox in Convex: %s", e)
-    logger.info("Sandbox completed: %s", json.dumps({"sandbox_id": sandbox_id, "outcome": outcome}))
+            logger.warning("Failed to complete sandbox in Convex (attempt %d/%d): %s", attempt + 1, attempts, e)
+        if attempt + 1 < attempts:
+            await asyncio.sleep(2 ** attempt)
+    return False
 
 
 if __name__ == "__main__":
@@ -411,9 +1128,23 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", required=True, help="Path to sandbox config JSON")
+    parser.add_argument("--resume", action="store_true",
+                        help="Restore loop state from the last checkpoint")
+    parser.add_argument("--record", help="Record all external I/O to this cassette file")
+    parser.add_argument("--replay", help="Replay external I/O from this cassette file, offline")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay speed multiplier; 0 replays as fast as possible")
     args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
 
     with open(args.config) as f:
         config = json.load(f)
 
-    asyncio.run(run_agent(config))
+    cassette = None
+    if args.record:
+        cassette = Cassette.record(args.record, sandbox_id=config["sandbox_id"], model=config["model"])
+    elif args.replay:
+        cassette = Cassette.load(args.replay, speed=args.replay_speed)
+
+    asyncio.run(run_agent(config, resume=args.resume, cassette=cassette))
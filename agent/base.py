@@ -1,9 +1,17 @@
 """Shared base types for the agent runtime — avoids circular imports."""
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from typing import Any
 
 
+@dataclass
+class ToolCall:
+    id: str
+    name: str
+    input: dict
+
+
 @dataclass
 class Decision:
     reasoning: str
@@ -12,9 +20,116 @@ class Decision:
     cost: float
     tool_use_id: str = ""
     raw_assistant_message: dict = field(default_factory=dict)
+    # Every tool call from the turn; action_type/action/tool_use_id mirror the first.
+    tool_calls: list[ToolCall] = field(default_factory=list)
+    # Token counts reported by the provider: input_tokens, output_tokens,
+    # cache_read_tokens, cache_write_tokens.
+    usage: dict[str, int] = field(default_factory=dict)
+    # USD spent on losing hedge requests for this decision (see hedging.py).
+    hedge_cost: float = 0.0
+
+    def calls(self) -> list[ToolCall]:
+        """All tool calls, or the single primary action when none were parsed."""
+        if self.tool_calls:
+            return self.tool_calls
+        return [ToolCall(id=self.tool_use_id, name=self.action_type, input=self.action)]
+
+
+@dataclass
+class IRPart:
+    """One block of a message in the provider-neutral conversation IR."""
+
+    kind: str  # "text" | "tool_call" | "tool_result"
+    text: str = ""
+    call_id: str = ""
+    name: str = ""
+    input: dict = field(default_factory=dict)
+
+
+@dataclass
+class IRMessage:
+    role: str  # "user" | "assistant"
+    parts: list[IRPart]
+
+
+def to_ir(message: dict[str, Any]) -> IRMessage:
+    """Convert one history message (Anthropic-shaped) to the IR."""
+    content = message.get("content")
+    if isinstance(content, str):
+        return IRMessage(message["role"], [IRPart("text", text=content)])
+    parts: list[IRPart] = []
+    for block in content if isinstance(content, list) else []:
+        if not isinstance(block, dict):
+            continue
+        kind = block.get("type")
+        if kind == "text":
+            parts.append(IRPart("text", text=block.get("text", "")))
+        elif kind == "tool_use":
+            parts.append(IRPart("tool_call", call_id=block.get("id", ""),
+                                name=block.get("name", ""), input=block.get("input") or {}))
+        elif kind == "tool_result":
+            result = block.get("content", "")
+            if isinstance(result, list):
+                result = " ".join(b.get("text", "") for b in result if isinstance(b, dict))
+            parts.append(IRPart("tool_result", text=str(result), call_id=block.get("tool_use_id", "")))
+    return IRMessage(message["role"], parts)
+
+
+class IncrementalEncoder:
+    """Encodes history messages into one provider's request format.
+
+    History messages are never modified in place (trimming copies them),
+    so each message's encoding is cached by identity and a step only
+    converts the messages added since the last one. Entries hold a
+    reference to their message so its id can't be reused, and the cache
+    is a bounded LRU, so one encoder can serve every agent sharing a
+    provider.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._cache: OrderedDict[int, tuple[dict[str, Any], list[Any]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, messages: list[dict[str, Any]]) -> list[Any]:
+        encoded: list[Any] = []
+        for message in messages:
+            encoded.extend(self._encoded(message))
+        return self.finish(encoded)
+
+    def _encoded(self, message: dict[str, Any]) -> list[Any]:
+        key = id(message)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] is message:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        result = self.encode_message(to_ir(message))
+        self._cache[key] = (message, result)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def encode_message(self, message: IRMessage) -> list[Any]:
+        """Provider messages for one IR message (may be several, or none)."""
+        raise NotImplementedError
+
+    def finish(self, encoded: list[Any]) -> list[Any]:
+        """Whole-request fixups on the concatenated encodings."""
+        return encoded
 
 
 class BaseProvider:
+    model_key: str = ""
+    context_window: int = 128_000
+    chars_per_token: float = 4.0
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate how many tokens ``text`` costs with this provider."""
+        return int(len(text) / self.chars_per_token) + 1
+
     async def think(
         self,
         messages: list[dict[str, Any]],
@@ -26,3 +141,11 @@ class BaseProvider:
         the last user message.
         """
         raise NotImplementedError
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
+        """Plain text completion of ``prompt`` (no tools), returned in ``reasoning``.
+
+        Used for side tasks such as history summaries. The default goes
+        through ``think``; providers override it to skip the tool schemas.
+        """
+        return await self.think([{"role": "user", "content": prompt}])
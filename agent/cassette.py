@@ -0,0 +1,291 @@
+"""Record/replay cassettes for the agent runtime's external I/O.
+
+In record mode every provider ``think`` call and every tool and
+EventBridge method call the loop makes is captured into a gzip JSONL
+cassette, along with its result (or error) and how long it took. In replay
+mode the same methods are replaced by ones that return the recorded
+results in order, with no network and no SDK clients. Replay runs either
+at the recorded speed or, with ``speed=0``, as fast as possible.
+
+Calls are matched per target (e.g. ``browser.execute``) in call order, not
+by arguments. A replayed run whose prompts differ slightly from the
+recorded one still lines up, as long as it makes the same sequence of calls.
+After a target's calls run out its last result repeats. Once the provider
+calls run out, the replayed agent stops.
+"""
+
+import asyncio
+import dataclasses
+import gzip
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any
+
+from base import BaseProvider, Decision, ToolCall
+from hedging import HedgePolicy
+from model_router import ModelRouter
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Methods whose calls leave the process, per runtime object. Attributes
+# listed under "state" are captured after the call and restored on replay.
+TOOL_METHODS: dict[str, dict[str, tuple[str, ...]]] = {
+    "browser": {
+        "create_session": ("session_id", "live_url"),
+        "attach_session": ("session_id", "live_url"),
+        "execute": ("live_url",),
+        "get_session_details": ("live_url",),
+        "close": ("session_id", "live_url"),
+    },
+    "mail": {"check_inbox": (), "send": (), "count_positive_replies": ()},
+    "payments": {
+        "get_balance": (),
+        "send_usdc": (),
+        "send_usdc_email": (),
+        "get_transaction_history": (),
+        "close": (),
+    },
+    "memory": {"search": (), "add": (), "close": ()},
+    "verifier": {"check_progress": ("_current_progress",), "close": ()},
+    "bridge": {
+        "push_event": (),
+        "update_progress": (),
+        "update_live_url": (),
+        "fetch_pending_prompts": (),
+        "acknowledge_prompt": (),
+        "complete_sandbox": (),
+    },
+}
+
+# Stands in for SDK clients during replay; every method that would use one
+# is replaced, so it is never touched.
+OFFLINE_CLIENT = object()
+
+
+class ReplayedError(Exception):
+    """An exception that was raised at this point in the recorded run."""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, Decision):
+        return {"__decision__": dataclasses.asdict(value)}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, dict) and "__decision__" in value:
+        fields = dict(value["__decision__"])
+        fields["tool_calls"] = [ToolCall(**c) for c in fields.get("tool_calls", [])]
+        return Decision(**fields)
+    return value
+
+
+class Cassette:
+    """One recording, open for writing (``record``) or reading (``load``)."""
+
+    def __init__(self, path: str, mode: str, speed: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.header: dict[str, Any] = {}
+        self._queues: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        self._last: dict[str, dict[str, Any]] = {}
+        self._warned: set[str] = set()
+        self._file: Any = None
+        self._started = time.monotonic()
+        self._count = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @classmethod
+    def record(cls, path: str, **header: Any) -> "Cassette":
+        cassette = cls(path, "record")
+        cassette.header = {"cassette": FORMAT_VERSION, "recorded_at": time.time(), **header}
+        cassette._file = gzip.open(path, "wt")
+        cassette._file.write(json.dumps(cassette.header) + "\n")
+        return cassette
+
+    @classmethod
+    def load(cls, path: str, speed: float = 1.0) -> "Cassette":
+        cassette = cls(path, "replay", speed=speed)
+        with gzip.open(path, "rt") as f:
+            try:
+                for number, line in enumerate(f):
+                    record = json.loads(line)
+                    if number == 0:
+                        cassette.header = record
+                    else:
+                        cassette._queues[record["target"]].append(record)
+            except (EOFError, json.JSONDecodeError):
+                # The recording process died mid-write; use what was flushed.
+                logger.warning("Cassette %s is truncated — replaying the complete part", path)
+        if cassette.header.get("cassette") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} cassette")
+        logger.info("Loaded cassette %s: %d calls", path, sum(len(q) for q in cassette._queues.values()))
+        return cassette
+
+    def attach(self, obj: Any, name: str) -> Any:
+        """Record or replay the I/O methods listed for ``name`` on ``obj``."""
+        for method, state in TOOL_METHODS[name].items():
+            target = f"{name}.{method}"
+            if self.replaying:
+                setattr(obj, method, self._replayer(obj, target))
+            elif hasattr(obj, method):
+                setattr(obj, method, self._recorder(obj, target, getattr(obj, method), state))
+        return obj
+
+    def attach_router(self, router: ModelRouter) -> None:
+        """Record every provider the router can build, or register replay providers."""
+        for key in router.PROVIDER_MODULES:
+            if self.replaying:
+                router.register(key, ReplayProvider(self))
+                continue
+            try:
+                provider = router.get(key)
+            except Exception:
+                continue
+            provider.think = self._recorder(provider, f"provider.{key}.think", provider.think, ())
+            provider.complete = self._recorder(provider, f"provider.{key}.complete", provider.complete, ())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info("Recorded %d calls to %s", self._count, self.path)
+
+    def _write(self, record: dict[str, Any]) -> None:
+        if self._file is None:
+            return
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._count += 1
+
+    def _recorder(self, obj: Any, target: str, method: Any, state: tuple[str, ...]):
+        async def recorded(*args: Any, **kwargs: Any) -> Any:
+            started = time.monotonic()
+            record: dict[str, Any] = {"target": target, "t": round(started - self._started, 4)}
+            try:
+                result = await method(*args, **kwargs)
+                record["result"] = _encode(result)
+                return result
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                # Cancelled calls (e.g. a losing hedge) returned nothing; leave them out.
+                if "result" in record or "error" in record:
+                    record["duration"] = round(time.monotonic() - started, 4)
+                    if state:
+                        record["state"] = {attr: getattr(obj, attr, None) for attr in state}
+                    self._write(record)
+
+        return recorded
+
+    def _replayer(self, obj: Any, target: str):
+        async def replayed(*args: Any, **kwargs: Any) -> Any:
+            return await self.replay(target, obj)
+
+        return replayed
+
+    async def replay(self, target: str, obj: Any = None) -> Any:
+        """Return the next recorded result for ``target``, after its recorded delay."""
+        queue = self._queues.get(target)
+        if queue:
+            record = self._last[target] = queue.popleft()
+        else:
+            # Past the end of the recording: repeat the last result for this target.
+            if target not in self._warned:
+                self._warned.add(target)
+                logger.warning("Cassette has no more %s calls — repeating the last one", target)
+            record = self._last.get(target, {"result": None})
+        if self.speed > 0:
+            await asyncio.sleep(record.get("duration", 0.0) / self.speed)
+        if obj is not None:
+            for attr, value in record.get("state", {}).items():
+                setattr(obj, attr, value)
+        if "error" in record:
+            raise ReplayedError(record["error"])
+        return _decode(record.get("result"))
+
+    def exhausted(self, target: str) -> bool:
+        return not self._queues.get(target)
+
+    def recorded(self, name: str) -> bool:
+        """True if the cassette holds any calls on the ``name`` object."""
+        return any(target.startswith(f"{name}.") for target in self._queues)
+
+
+class ReplayProvider(BaseProvider):
+    """Returns the recorded decisions for its model key, in order."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    async def think(self, messages: list[dict[str, Any]], **context: Any) -> Decision:
+        target = f"provider.{self.model_key}.think"
+        if self.cassette.exhausted(target):
+            return Decision(
+                reasoning="Cassette exhausted — end of the recorded session",
+                action_type="finish_reasoning",
+                action={"reasoning": "End of recording", "should_stop": True},
+                cost=0.0,
+            )
+        decision = await self.cassette.replay(target)
+        stream = context.get("stream")
+        if stream is not None:
+            stream.on_text(decision.reasoning)
+            for call in decision.calls():
+                stream.on_tool_call(call)
+        return decision
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
+        target = f"provider.{self.model_key}.complete"
+        if self.cassette.exhausted(target):
+            return Decision(reasoning="", action_type="", action={}, cost=0.0)
+        return await self.cassette.replay(target)
+
+
+class ReplayBridge:
+    """EventBridge stand-in. Methods are no-ops unless the cassette recorded
+    bridge calls, in which case ``Cassette.attach`` replaces them."""
+
+    async def push_event(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    async def update_progress(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    async def update_live_url(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    async def fetch_pending_prompts(self, *args: Any, **kwargs: Any) -> list[dict[str, Any]]:
+        return []
+
+    async def acknowledge_prompt(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+    async def complete_sandbox(self, *args: Any, **kwargs: Any) -> None:
+        return None
+
+
+class OfflineResources:
+    """Stand-in for ``agent_host.SharedResources`` during replay.
+
+    The router holds replay providers, and the tools get placeholder
+    clients, so a replayed run needs no API keys, SDKs or network.
+    """
+
+    def __init__(self, cassette: Cassette):
+        self.router = ModelRouter()
+        cassette.attach_router(self.router)
+        self.hedge = HedgePolicy(max_in_flight=1)
+        self.http = OFFLINE_CLIENT
+        self.browser_client = OFFLINE_CLIENT
+        self.mail_client = OFFLINE_CLIENT
+        self.memory_client = OFFLINE_CLIENT
+        self.locus_client = OFFLINE_CLIENT
@@ -0,0 +1,150 @@
+"""Append-only on-disk checkpoints of the agent loop state.
+
+Each step appends one JSON line. A full snapshot would rewrite the whole
+history every step, so a line stores the messages as a diff against the
+previous line. Every ``compact_every`` lines, the file is rewritten as one
+full snapshot (write to a temp file, fsync, ``os.replace``). Lines are
+fsynced on write. A crash mid-write can only leave a partial last line,
+and ``load`` ignores it.
+
+A message diff says the new history is ``prev[:p] + prev[j:j + n] +
+append``. That covers both appending a step and a trim that drops turns
+after ``messages[0]``. Kept messages are matched by identity, so the diff
+is cheap to compute.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+def diff_messages(prev: list[Any], new: list[Any]) -> dict[str, Any]:
+    """Encode ``new`` relative to ``prev`` (see module docstring)."""
+    p = 0
+    while p < len(prev) and p < len(new) and new[p] is prev[p]:
+        p += 1
+    j = n = 0
+    if p < len(new):
+        positions = {id(m): i for i, m in enumerate(prev)}
+        start = positions.get(id(new[p]))
+        if start is not None and start >= p:
+            j = start
+            while p + n < len(new) and j + n < len(prev) and new[p + n] is prev[j + n]:
+                n += 1
+    return {"p": p, "j": j, "n": n, "append": new[p + n:]}
+
+
+def apply_diff(prev: list[Any], diff: dict[str, Any]) -> list[Any]:
+    p, j, n = diff["p"], diff["j"], diff["n"]
+    return prev[:p] + prev[j:j + n] + list(diff["append"])
+
+
+class Checkpointer:
+    """Writes and restores one sandbox's loop state."""
+
+    def __init__(self, path: str, compact_every: int = 50, fsync: bool = True):
+        self.path = path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._messages: list[Any] = []
+        self._records = 0
+
+    def save(self, messages: list[dict[str, Any]], **state: Any) -> None:
+        """Append this step's state. ``state`` must be JSON-serializable."""
+        if self._records >= self.compact_every:
+            self._compact(messages, state)
+            return
+        record = {
+            "v": FORMAT_VERSION,
+            "ts": time.time(),
+            "messages": diff_messages(self._messages, messages),
+            **state,
+        }
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except OSError as e:
+            logger.warning("Checkpoint write to %s failed: %s", self.path, e)
+            return
+        self._messages = list(messages)
+        self._records += 1
+
+    def load(self) -> dict[str, Any] | None:
+        """Rebuild the latest state, or None if there is no usable checkpoint.
+
+        The returned dict holds the last record's fields, with ``messages``
+        replaced by the reconstructed history.
+        """
+        try:
+            with open(self.path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+
+        messages: list[Any] = []
+        state: dict[str, Any] | None = None
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                if number == len(lines):
+                    logger.info("Ignoring partial last checkpoint line in %s", self.path)
+                else:
+                    logger.warning("Corrupt checkpoint line %d in %s — using state before it",
+                                   number, self.path)
+                break
+            if record.get("v") != FORMAT_VERSION:
+                logger.warning("Unknown checkpoint format %r in %s", record.get("v"), self.path)
+                return None
+            messages = apply_diff(messages, record["messages"])
+            state = record
+
+        if state is None:
+            return None
+        state = {k: v for k, v in state.items() if k not in ("v", "ts")}
+        state["messages"] = messages
+        # Continue from the restored history so the next diff lines up.
+        self._compact(messages, {k: v for k, v in state.items() if k != "messages"})
+        return state
+
+    def reset(self) -> None:
+        """Drop any checkpoint left by an earlier run."""
+        self._messages = []
+        self._records = 0
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Failed to remove checkpoint %s: %s", self.path, e)
+
+    def _compact(self, messages: list[Any], state: dict[str, Any]) -> None:
+        """Atomically replace the file with a single full-snapshot line."""
+        record = {
+            "v": FORMAT_VERSION,
+            "ts": time.time(),
+            "messages": {"p": 0, "j": 0, "n": 0, "append": messages},
+            **state,
+        }
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Checkpoint compaction of %s failed: %s", self.path, e)
+            return
+        self._messages = list(messages)
+        self._records = 1
@@ -0,0 +1,112 @@
+"""Deadline propagation for the agent loop.
+
+The loop used to check ``time_expired`` only between steps, so a five-minute
+browser task, a slow LLM call or a hung push could run well past the
+challenge's time limit and hold up settlement. ``Deadline.scope`` wraps
+the whole loop. When the time limit hits, it cancels the loop task at
+whatever it is awaiting, and cancellation reaches every awaited child task
+and gather. Control then leaves the scope normally, so completion runs
+right away.
+
+Payments are the exception. Cancelling a transfer that is already in
+flight can move funds that the ledger and checkpoint never record, so the
+runner ``hold``s the deadline while a step with a payment runs, and the
+cancel waits for ``release`` (at most ``grace`` seconds).
+
+Phases also get their own timeouts (``timeout``). Such a timeout only
+applies when it would end before the deadline; otherwise the scope takes
+care of it.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, Awaitable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Per-call caps in seconds, applied when they end before the deadline.
+THINK_TIMEOUT = 120.0
+TOOL_TIMEOUTS: dict[str, float] = {
+    "browser_task": 300.0,
+    "send_email": 30.0,
+    "send_usdc": 60.0,
+    "send_usdc_email": 60.0,
+    "fetch_result": 10.0,
+}
+DEFAULT_TOOL_TIMEOUT = 60.0
+
+
+class Deadline:
+    """A monotonic point in time that the agent's in-flight work must not outlive."""
+
+    def __init__(self, remaining_seconds: float, grace: float = 15.0, cleanup_timeout: float = 10.0):
+        self.at = time.monotonic() + remaining_seconds
+        self.grace = grace
+        self.cleanup_timeout = cleanup_timeout
+        self.fired = False
+        self._active = False
+        self._holds = 0
+        self._deferred: asyncio.Task | None = None
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def timeout(self, cap: float) -> float | None:
+        """``cap`` if it ends before the deadline, else None (the scope enforces it)."""
+        return cap if cap < self.remaining else None
+
+    @contextlib.asynccontextmanager
+    async def scope(self) -> AsyncIterator[None]:
+        """Cancel the enclosed work when the deadline passes, then carry on after the block."""
+        task = asyncio.current_task()
+        self._active = True
+        handle = asyncio.get_running_loop().call_later(self.remaining, self._fire, task)
+        try:
+            yield
+        except asyncio.CancelledError:
+            if not self.fired:
+                raise
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+            logger.warning("Time limit reached — cancelled in-flight work")
+        finally:
+            self._active = False
+            handle.cancel()
+
+    def hold(self) -> None:
+        """Defer the deadline's cancel until the matching ``release``."""
+        self._holds += 1
+
+    def release(self) -> None:
+        self._holds = max(0, self._holds - 1)
+        if not self._holds and self._deferred is not None:
+            self._cancel()
+
+    def _fire(self, task: asyncio.Task) -> None:
+        self._deferred = task
+        if self._holds:
+            logger.info("Time limit reached — waiting up to %.0fs for a payment to be recorded", self.grace)
+            asyncio.get_running_loop().call_later(self.grace, self._cancel)
+            return
+        self._cancel()
+
+    def _cancel(self) -> None:
+        task, self._deferred = self._deferred, None
+        if task is not None and self._active and not task.done():
+            self.fired = True
+            task.cancel()
+
+    async def bounded(self, awaitable: Awaitable[T], what: str, timeout: float | None = None) -> T | None:
+        """Await shutdown work for at most ``timeout`` (default ``cleanup_timeout``) seconds."""
+        try:
+            return await asyncio.wait_for(awaitable, timeout or self.cleanup_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s did not finish within %.0fs — abandoned", what, timeout or self.cleanup_timeout)
+        except Exception as e:
+            logger.warning("%s failed: %s", what, e)
+        return None
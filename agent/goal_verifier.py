@@ -15,6 +15,7 @@ class GoalVerifier:
         sandbox_config: dict[str, Any],
         payments_tool: Any = None,
         email_tool: Any = None,
+        http_client: httpx.AsyncClient | None = None,
     ):
         self.config = sandbox_config
         self.goal_type = sandbox_config.get("goal_type", "")
@@ -22,7 +23,8 @@ class GoalVerifier:
         self.start_time = time.time()
         self.time_limit = sandbox_config.get("time_limit", 86400)
         self._current_progress: float = 0
-        self._http = httpx.AsyncClient(timeout=15.0)
+        self._owns_http = http_client is None
+        self._http = http_client or httpx.AsyncClient(timeout=15.0)
         self._payments = payments_tool
         self._email = email_tool
 
@@ -145,3 +147,7 @@ class GoalVerifier:
         except Exception as e:
             logger.debug("Positive replies count failed: %s", e)
             return self._current_progress
+
+    async def close(self) -> None:
+        if self._owns_http:
+            await self._http.aclose()
@@ -0,0 +1,133 @@
+"""Hedged think requests — race a fallback provider against a slow primary.
+
+Without hedging the fallback chain is strictly sequential: the next provider
+is only tried after the previous one raises, which can take a full request
+timeout. With a ``HedgePolicy`` the next provider is started in parallel
+once the current one has run longer than its observed p95 latency. The
+first valid Decision wins and the other requests are cancelled (and
+awaited, so the caller can account for what they already spent). A
+semaphore caps the number of hedge requests in flight, and can be shared
+across agents on one host. When the cap is reached, the race waits for
+either a result or a free slot, whichever comes first.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from base import BaseProvider, Decision
+from metrics import StepMetrics
+
+logger = logging.getLogger(__name__)
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        default_delay: float = 10.0,
+        min_delay: float = 1.0,
+        quantile: float = 0.95,
+    ):
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.quantile = quantile
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def delay_for(self, provider: BaseProvider, metrics: StepMetrics | None) -> float:
+        """How long to wait on ``provider`` before hedging: its successful-call p95."""
+        observed = None
+        if metrics is not None:
+            observed = metrics.percentile(
+                "think_provider", self.quantile,
+                provider=type(provider).__name__, outcome="ok",
+            )
+        return max(self.min_delay, observed if observed is not None else self.default_delay)
+
+    async def race(
+        self,
+        chain: list[BaseProvider],
+        attempt: Callable[[BaseProvider, bool], Awaitable[Decision]],
+        metrics: StepMetrics | None = None,
+    ) -> Decision:
+        """Return the first Decision from ``chain``, hedging slow providers.
+
+        ``attempt(provider, is_primary)`` performs one think call. Errors
+        fall through to the next provider immediately, as in the plain
+        fallback chain.
+        """
+        remaining = list(chain)
+        pending: dict[asyncio.Task, BaseProvider] = {}
+        last_error: BaseException | None = None
+        # Waits for a hedge slot once the cap is reached; its result is that slot.
+        slot_wait: asyncio.Task | None = None
+
+        def _launch(hedge: bool, holding_slot: bool = False) -> BaseProvider:
+            provider = remaining.pop(0)
+            coro = attempt(provider, provider is chain[0])
+            if hedge and not holding_slot:
+                coro = self._in_slot(coro)
+            task = asyncio.create_task(coro)
+            if holding_slot:
+                task.add_done_callback(lambda _: self._slots.release())
+            pending[task] = provider
+            return provider
+
+        newest = _launch(hedge=False)
+        try:
+            while pending:
+                timeout = None
+                if remaining and slot_wait is None:
+                    timeout = self.delay_for(newest, metrics)
+                done, _ = await asyncio.wait(
+                    [*pending, *([slot_wait] if slot_wait is not None else [])],
+                    timeout=timeout, return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if slot_wait is not None and slot_wait in done:
+                    done.discard(slot_wait)
+                    slot_wait = None
+                    if remaining:
+                        slow = type(newest).__name__
+                        newest = _launch(hedge=True, holding_slot=True)
+                        logger.info("Hedge slot freed — hedging %s with %s", slow, type(newest).__name__)
+                    else:
+                        self._slots.release()
+                    if not done:
+                        continue
+
+                if not done:
+                    if self._slots.locked():
+                        logger.info("Hedge cap reached — waiting on %s or a free slot", type(newest).__name__)
+                        slot_wait = asyncio.create_task(self._slots.acquire())
+                        continue
+                    slow = type(newest).__name__
+                    newest = _launch(hedge=True)
+                    logger.info("%s slower than %.1fs — hedging with %s",
+                                slow, timeout, type(newest).__name__)
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not pending and remaining:
+                    newest = _launch(hedge=False)
+        finally:
+            if slot_wait is not None:
+                if slot_wait.done() and not slot_wait.cancelled():
+                    self._slots.release()
+                else:
+                    slot_wait.cancel()
+            for task in pending:
+                task.cancel()
+            # Let the losers settle, so their spend is recorded before the caller charges the step.
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        raise last_error or RuntimeError("No providers in fallback chain")
+
+    async def _in_slot(self, coro: Awaitable[Decision]) -> Decision:
+        """Run a hedge request while holding one of the shared hedge slots."""
+        async with self._slots:
+            return await coro
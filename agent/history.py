@@ -0,0 +1,175 @@
+"""Token-budget-aware conversation history trimming.
+
+The runtime keeps the conversation in Anthropic message shape. One step
+appends a user prompt, the assistant's tool_use turn and a user
+tool_result, and those three only make sense together. Trimming therefore
+works on whole turns. A turn starts at a user message that is not just
+tool results, so a tool_use is never separated from its tool_result.
+
+The head of the history is ``messages[0]`` plus, when present, the rolling
+episode summary right after it (see summary.py). Trimming never drops the
+head, and hands the turns it drops to an ``on_evict`` callback.
+"""
+
+import json
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+TRUNCATION_MARKER = "\n…[truncated]…\n"
+SUMMARY_HEADER = "EPISODE SUMMARY (condensed from earlier steps that no longer fit in context):\n"
+
+
+def message_text(message: dict[str, Any]) -> str:
+    """Flatten a message into the text a provider would tokenize."""
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=str)
+
+
+def is_summary_message(message: dict[str, Any]) -> bool:
+    content = message.get("content")
+    return message.get("role") == "user" and isinstance(content, str) and content.startswith(SUMMARY_HEADER)
+
+
+def head_length(messages: list[dict[str, Any]]) -> int:
+    """How many leading messages form the fixed head (prompt, then summary if any)."""
+    if len(messages) > 1 and is_summary_message(messages[1]):
+        return 2
+    return min(len(messages), 1)
+
+
+def is_turn_start(message: dict[str, Any]) -> bool:
+    """True for a user message that opens a new step (not only tool results)."""
+    if message.get("role") != "user":
+        return False
+    content = message.get("content")
+    if isinstance(content, str):
+        return True
+    return not all(
+        isinstance(block, dict) and block.get("type") == "tool_result"
+        for block in content or []
+    )
+
+
+def split_turns(messages: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Group messages into turns, each starting at a turn-start user message."""
+    turns: list[list[dict[str, Any]]] = []
+    for message in messages:
+        if not turns or is_turn_start(message):
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+class HistoryTrimmer:
+    """Keeps the head plus the newest whole turns that fit a token budget.
+
+    Once the history exceeds the budget it is cut down to ``low_water`` of
+    the budget, not just below it. The kept prefix then stays the same for
+    many steps, which keeps provider prompt caches valid between trims.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        context_window: int,
+        fraction: float = 0.5,
+        reserve_tokens: int = 4096,
+        low_water: float = 0.75,
+        on_evict: Callable[[list[list[dict[str, Any]]]], None] | None = None,
+        chars_per_token: float = 4.0,
+    ):
+        self.count_tokens = count_tokens
+        self.chars_per_token = chars_per_token
+        self.budget = max(1024, int(context_window * fraction) - reserve_tokens)
+        self.low_water = low_water
+        self.on_evict = on_evict
+        self._cache: dict[int, tuple[dict[str, Any], int]] = {}
+
+    def tokens(self, message: dict[str, Any]) -> int:
+        """Token count for one message, memoized by identity."""
+        cached = self._cache.get(id(message))
+        if cached is not None and cached[0] is message:
+            return cached[1]
+        count = self.count_tokens(message_text(message)) + 4
+        self._cache[id(message)] = (message, count)
+        return count
+
+    def total(self, messages: list[dict[str, Any]]) -> int:
+        return sum(self.tokens(m) for m in messages)
+
+    def trim(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Return ``messages`` cut down to the budget on turn boundaries."""
+        if len(messages) <= 1 or self.total(messages) <= self.budget:
+            self._prune(messages)
+            return messages
+
+        split = head_length(messages)
+        head, turns = messages[:split], split_turns(messages[split:])
+        if not turns:
+            return messages
+        remaining = int(self.budget * self.low_water) - self.total(head)
+        kept: list[list[dict[str, Any]]] = []
+        for turn in reversed(turns):
+            turn_tokens = self.total(turn)
+            if turn_tokens > remaining and kept:
+                break
+            kept.append(turn)
+            remaining -= turn_tokens
+
+        kept.reverse()
+        excess = self.total(head) + self.total(kept[0]) - self.budget
+        if excess > 0:
+            # Even the newest turn alone is over budget — shrink its tool results.
+            kept[0] = self._shrink_turn(kept[0], excess)
+
+        trimmed = head + [m for turn in kept for m in turn]
+        logger.info(
+            "Trimmed history from %d to %d messages (%d turns dropped, budget %d tokens)",
+            len(messages), len(trimmed), len(turns) - len(kept), self.budget,
+        )
+        self._prune(trimmed)
+        dropped = turns[:len(turns) - len(kept)]
+        if dropped and self.on_evict is not None:
+            self.on_evict(dropped)
+        return trimmed
+
+    def _shrink_turn(self, turn: list[dict[str, Any]], excess_tokens: int) -> list[dict[str, Any]]:
+        """Cut tool_result text in ``turn`` (head and tail kept) until ~``excess_tokens`` are saved."""
+        shrunk: list[dict[str, Any]] = []
+        for message in turn:
+            content = message.get("content")
+            if not isinstance(content, list) or excess_tokens <= 0:
+                shrunk.append(message)
+                continue
+            blocks = []
+            for block in content:
+                text = block.get("content") if isinstance(block, dict) else None
+                if isinstance(text, str) and block.get("type") == "tool_result" and excess_tokens > 0:
+                    original = text
+                    while excess_tokens > 0:
+                        cut_chars = int(excess_tokens * self.chars_per_token) + len(TRUNCATION_MARKER)
+                        keep_chars = max(200, len(text) - cut_chars)
+                        if keep_chars >= len(text):
+                            break
+                        half = keep_chars // 2
+                        cut = text[:half] + TRUNCATION_MARKER + text[-half:]
+                        # Re-count what the message text actually saves: tokenizers and
+                        # JSON escaping make the chars-per-token estimate approximate.
+                        excess_tokens -= self.count_tokens(json.dumps(text)) - self.count_tokens(json.dumps(cut))
+                        text = cut
+                    if text is not original:
+                        block = {**block, "content": text}
+                blocks.append(block)
+            shrunk.append({**message, "content": blocks})
+        return shrunk
+
+    def _prune(self, messages: list[dict[str, Any]]) -> None:
+        """Drop cache entries for messages no longer in the history."""
+        if len(self._cache) > 2 * len(messages) + 16:
+            live = {id(m) for m in messages}
+            self._cache = {k: v for k, v in self._cache.items() if k in live}
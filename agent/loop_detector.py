@@ -0,0 +1,221 @@
+"""Near-duplicate loop detection over the agent's recent actions.
+
+Each executed action is reduced to two small MinHash sketches: one of the
+action's arguments and one of its result. Shingles are normalized words
+and word pairs, so a trivially reworded browser task still matches the
+original. The last ``window`` sketches sit in a ring buffer. Each step
+compares the new action against the buffer for cycles of period 1-3 (A-A-A,
+A-B-A-B, A-B-C-A-B-C), so the work per step is bounded by the window size.
+
+Arguments that name who an action is aimed at (``IDENTITY_KEYS``) must
+match exactly before sketches are compared at all. A templated email to
+a new recipient is different work, however similar the body.
+
+Escalation happens in two stages. First the prompt gets a hint. If the
+agent keeps looping, the actions in the cycle are blocked for a few steps,
+and any near-duplicate call is refused the way a constraint violation is.
+"""
+
+import json
+import logging
+import re
+import zlib
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_WORD = re.compile(r"[a-z0-9@._$-]+")
+STOPWORDS = frozenset(
+    "a an and the to of on in for with at by from into then please go navigate "
+    "open visit use try again now it its this that is are be".split()
+)
+# Result fields that differ on every call without meaning anything changed.
+VOLATILE_RESULT_KEYS = frozenset({
+    "task_id", "cost_usd", "session_status", "timestamp", "tx_hash", "id", "_ref", "_truncated",
+})
+# Action fields naming the recipient; two calls with different values are never duplicates.
+IDENTITY_KEYS = ("to", "to_address", "email")
+
+
+def shingles(text: str) -> set[str]:
+    """Normalized words plus adjacent word pairs."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash(text: str, num_perm: int = 32) -> tuple[int, ...]:
+    """MinHash signature of ``text``'s shingles; empty text gives all-max."""
+    hashes = [zlib.crc32(s.encode()) for s in shingles(text)]
+    if not hashes:
+        return (_MASK,) * num_perm
+    return tuple(
+        min(((a * h + b) % _PRIME) & _MASK for h in hashes)
+        for a, b in _PERMUTATIONS[:num_perm]
+    )
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _permutations(n: int) -> list[tuple[int, int]]:
+    # Fixed seeds so sketches are comparable across processes (checkpoints).
+    return [(zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode())) for i in range(n)]
+
+
+_PERMUTATIONS = _permutations(128)
+
+
+def action_text(action: Any) -> str:
+    if isinstance(action, dict):
+        return " ".join(str(v) for _, v in sorted(action.items()))
+    return str(action)
+
+
+def action_identity(action: Any) -> str:
+    """The normalized recipient of ``action``, or "" if it has none."""
+    if not isinstance(action, dict):
+        return ""
+    return "|".join(str(action.get(key, "")).strip().lower() for key in IDENTITY_KEYS)
+
+
+def result_text(result: Any) -> str:
+    if isinstance(result, dict):
+        result = {k: v for k, v in result.items() if k not in VOLATILE_RESULT_KEYS}
+    return json.dumps(result, sort_keys=True, default=str)
+
+
+@dataclass
+class ActionSketch:
+    action_type: str
+    identity: str
+    summary: str
+    action: tuple[int, ...]
+    result: tuple[int, ...]
+
+
+class LoopDetector:
+    """Tracks recent actions and escalates when the agent goes in circles."""
+
+    # Ending a step to wait or reflect is never a wasted action.
+    IGNORED_ACTION_TYPES = frozenset({"finish_reasoning"})
+
+    def __init__(
+        self,
+        window: int = 12,
+        threshold: float = 0.6,
+        max_period: int = 3,
+        block_after: int = 2,
+        block_steps: int = 5,
+        num_perm: int = 32,
+    ):
+        self.threshold = threshold
+        self.max_period = max_period
+        self.block_after = block_after
+        self.block_steps = block_steps
+        self.num_perm = num_perm
+        self.recent: deque[ActionSketch] = deque(maxlen=window)
+        self.period: int | None = None
+        self.strikes = 0
+        self.blocked: list[ActionSketch] = []
+        self._blocked_until = 0
+        self._steps = 0
+
+    def sketch(self, action_type: str, action: Any, result: Any = None) -> ActionSketch:
+        text = action_text(action)
+        return ActionSketch(
+            action_type=action_type,
+            identity=action_identity(action),
+            summary=text[:80],
+            action=minhash(text, self.num_perm),
+            result=minhash(result_text(result), self.num_perm),
+        )
+
+    def same_target(self, a: ActionSketch, b: ActionSketch) -> bool:
+        """Same tool aimed at the same recipient (if any); a precondition for a duplicate."""
+        return a.action_type == b.action_type and a.identity == b.identity
+
+    def is_duplicate(self, a: ActionSketch, b: ActionSketch) -> bool:
+        """Same tool and near-identical arguments, or similar arguments with the same outcome."""
+        if not self.same_target(a, b):
+            return False
+        action_sim = similarity(a.action, b.action)
+        if action_sim >= self.threshold:
+            return True
+        return action_sim >= self.threshold / 2 and similarity(a.result, b.result) >= 0.8
+
+    def record(self, action_type: str, action: Any, result: Any) -> None:
+        """Add one executed action to the window."""
+        if action_type in self.IGNORED_ACTION_TYPES:
+            return
+        self.recent.append(self.sketch(action_type, action, result))
+
+    def end_step(self) -> None:
+        """Re-evaluate after a step's actions are recorded; updates the escalation level."""
+        self._steps += 1
+        if self.blocked and self._steps >= self._blocked_until:
+            self.blocked = []
+        self.period = self._find_cycle()
+        if self.period is None:
+            self.strikes = 0
+            return
+        self.strikes += 1
+        logger.info("Loop detected (period %d, strike %d)", self.period, self.strikes)
+        if self.strikes >= self.block_after:
+            self.blocked = list(self.recent)[-self.period:]
+            self._blocked_until = self._steps + self.block_steps
+
+    def repeats(self, action_type: str, action: Any) -> bool:
+        """True if this call nearly duplicates one of the last ``max_period`` actions."""
+        if action_type in self.IGNORED_ACTION_TYPES:
+            return False
+        candidate = self.sketch(action_type, action)
+        return any(
+            self.same_target(sketch, candidate) and similarity(sketch.action, candidate.action) >= self.threshold
+            for sketch in list(self.recent)[-self.max_period:]
+        )
+
+    def _find_cycle(self) -> int | None:
+        """Smallest period p with the last 2p actions (3 for p=1) repeating."""
+        items = list(self.recent)
+        for period in range(1, self.max_period + 1):
+            span = 3 if period == 1 else 2 * period
+            if len(items) < span:
+                return None
+            tail = items[-span:]
+            if all(self.is_duplicate(tail[i], tail[i - period]) for i in range(period, span)):
+                return period
+        return None
+
+    def hint(self) -> str | None:
+        """Prompt warning for the current escalation level, if looping."""
+        if self.blocked:
+            listed = "; ".join(f"{s.action_type}({s.summary})" for s in self.blocked)
+            return (
+                "STRATEGY CHANGE REQUIRED: you have kept repeating the same actions "
+                f"without progress. These actions and close rewordings of them are blocked "
+                f"for the next few steps: {listed}. Pick a genuinely different approach."
+            )
+        if self.period is None:
+            return None
+        if self.period == 1:
+            return "You appear stuck repeating the same action. Try a completely different approach or strategy."
+        return (
+            f"You appear stuck cycling through the same {self.period} actions. "
+            "Try a completely different approach or strategy."
+        )
+
+    def block_reason(self, action_type: str, action: Any) -> str | None:
+        """Reason to refuse this call, if it repeats a blocked action."""
+        if not self.blocked:
+            return None
+        candidate = self.sketch(action_type, action)
+        for sketch in self.blocked:
+            if self.same_target(sketch, candidate) and similarity(sketch.action, candidate.action) >= self.threshold:
+                return f"Action '{action_type}' blocked: it repeats an action that has been looping without progress"
+        return None
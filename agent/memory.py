@@ -3,18 +3,43 @@
 import asyncio
 import os
 import logging
+import time
 from typing import Any
 
-from supermemory import Supermemory
-
 logger = logging.getLogger(__name__)
 
 
 class AgentMemory:
-    def __init__(self, api_key: str | None = None):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        client: Any = None,
+        batch_size: int = 8,
+        flush_interval: float = 2.0,
+        max_pending: int = 256,
+        close_timeout: float = 10.0,
+        search_ttl: float = 120.0,
+        invalidate_after: int = 5,
+        stale_while_revalidate: bool = True,
+    ):
         self.api_key = api_key or os.environ.get("SUPERMEMORY_API_KEY", "")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.close_timeout = close_timeout
+        self._queue: asyncio.Queue | None = None
+        self._flusher: asyncio.Task | None = None
+        self.search_ttl = search_ttl
+        self.invalidate_after = invalidate_after
+        self.stale_while_revalidate = stale_while_revalidate
+        self._search_cache: dict[tuple[str, str, int], tuple[float, int, list[dict[str, Any]]]] = {}
+        self._refreshing: dict[tuple[str, str, int], asyncio.Task] = {}
+        self._landed: dict[str, int] = {}
         try:
-            self.client = Supermemory(api_key=self.api_key)
+            if client is None:
+                from supermemory import Supermemory
+                client = Supermemory(api_key=self.api_key)
+            self.client = client
             self._available = True
         except Exception:
             self.client = None
@@ -22,26 +47,109 @@ class AgentMemory:
             logger.warning("Supermemory client not available — running without persistent memory")
 
     async def add(self, content: str, sandbox_id: str, goal_type: str, source: str = "agent") -> None:
-        """Store a learning or observation in long-term memory."""
+        """Queue a learning or observation for long-term memory.
+
+        Writes are batched and sent in the background. This only waits when
+        ``max_pending`` writes are already queued (backpressure).
+        """
         if not self._available:
             return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._flusher = asyncio.create_task(self._flush_loop())
+        await self._queue.put({
+            "content": content,
+            "container_tag": sandbox_id,
+            "metadata": {
+                "goal_type": goal_type,
+                "source": source,
+            },
+        })
+
+    async def flush(self) -> None:
+        """Wait until every queued write has been sent."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """Flush pending writes and stop the background writer."""
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+        if self._queue is None:
+            return
         try:
-            await asyncio.to_thread(
-                self.client.add,
-                content=content,
-                container_tag=sandbox_id,
-                metadata={
-                    "goal_type": goal_type,
-                    "source": source,
-                },
-            )
-        except Exception as e:
-            logger.warning("Failed to store memory: %s", e)
+            await asyncio.wait_for(self.flush(), timeout=self.close_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropped %d unflushed memories on shutdown", self._queue.qsize())
+        if self._flusher is not None:
+            self._flusher.cancel()
+        self._queue = None
+        self._flusher = None
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            finally:
+                for item in batch:
+                    tag = item["container_tag"]
+                    self._landed[tag] = self._landed.get(tag, 0) + 1
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        """Send a batch of writes from one worker thread."""
+        for item in batch:
+            try:
+                self.client.add(**item)
+            except Exception as e:
+                logger.warning("Failed to store memory: %s", e)
 
     async def search(self, query: str, sandbox_id: str, top_k: int = 5) -> list[dict[str, Any]]:
-        """Retrieve relevant past context."""
+        """Retrieve relevant past context, served from a per-sandbox cache.
+
+        A cached result is fresh for ``search_ttl`` seconds, or until
+        ``invalidate_after`` new memories have landed for the sandbox. With
+        ``stale_while_revalidate`` a stale result is returned immediately and
+        refreshed in the background, so only the first search waits.
+        """
         if not self._available:
             return []
+        key = (sandbox_id, query, top_k)
+        entry = self._search_cache.get(key)
+        if entry is not None and self._is_fresh(entry, sandbox_id):
+            return entry[2]
+        if entry is not None and self.stale_while_revalidate:
+            if key not in self._refreshing:
+                self._refreshing[key] = asyncio.create_task(self._refresh(key))
+            return entry[2]
+
+        task = self._refreshing.get(key)
+        if task is None:
+            task = self._refreshing[key] = asyncio.create_task(self._refresh(key))
+        return await asyncio.shield(task)
+
+    def _is_fresh(self, entry: tuple[float, int, list], sandbox_id: str) -> bool:
+        fetched_at, landed_at_fetch, _ = entry
+        return (
+            time.monotonic() - fetched_at < self.search_ttl
+            and self._landed.get(sandbox_id, 0) - landed_at_fetch < self.invalidate_after
+        )
+
+    async def _refresh(self, key: tuple[str, str, int]) -> list[dict[str, Any]]:
+        sandbox_id, query, top_k = key
+        landed = self._landed.get(sandbox_id, 0)
         try:
             results = await asyncio.to_thread(
                 self.client.search.memories,
@@ -50,16 +158,21 @@ class AgentMemory:
                 search_mode="hybrid",
                 limit=top_k,
             )
-            return [
+            memories = [
                 {
                     "content": getattr(r, "memory", None) or getattr(r, "chunk", ""),
                     "similarity": getattr(r, "similarity", 0),
                 }
                 for r in (results.results or [])
             ]
+            self._search_cache[key] = (time.monotonic(), landed, memories)
+            return memories
         except Exception as e:
             logger.warning("Failed to search memory: %s", e)
-            return []
+            entry = self._search_cache.get(key)
+            return entry[2] if entry is not None else []
+        finally:
+            self._refreshing.pop(key, None)
 
     async def add_user_prompt(self, prompt: str, sandbox_id: str) -> None:
         """Store a user-injected prompt as retrievable memory."""
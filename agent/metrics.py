@@ -0,0 +1,136 @@
+"""Per-phase step latency metrics for the agent loop.
+
+Each phase of a step (context gather, think, execute, memory write, progress
+check, event pushes) is timed into a log-bucketed histogram keyed by phase
+name and labels such as provider or action_type. Histograms have a fixed
+size no matter how long the run is, and give p50/p95/p99 to within ~2.5%.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (seconds)."""
+
+    MIN_VALUE = 1e-4
+    GROWTH = 1.05
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        value = max(seconds, self.MIN_VALUE)
+        index = int(math.log(value / self.MIN_VALUE) / math.log(self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                # Geometric midpoint of the bucket, capped by the observed max.
+                midpoint = self.MIN_VALUE * self.GROWTH ** (index + 0.5)
+                return min(midpoint, self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.percentile(0.50), 4),
+            "p95": round(self.percentile(0.95), 4),
+            "p99": round(self.percentile(0.99), 4),
+            "max": round(self.max, 4),
+        }
+
+
+def metric_key(name: str, **labels: Any) -> str:
+    """Render ``think`` + ``provider=X`` as ``think{provider=X}``."""
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+class StepMetrics:
+    """Phase timers for one sandbox's agent loop."""
+
+    def __init__(self, sandbox_id: str, emit_interval: float = 60.0, dump_path: str | None = None):
+        self.sandbox_id = sandbox_id
+        self.emit_interval = emit_interval
+        self.dump_path = dump_path or os.environ.get(
+            "AGENT_METRICS_PATH", f"metrics-{sandbox_id}.json",
+        )
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self._last_emit = time.monotonic()
+
+    def record(self, name: str, seconds: float, **labels: Any) -> None:
+        key = metric_key(name, **labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    @contextmanager
+    def phase(self, name: str, **labels: Any) -> Iterator[None]:
+        """Time the enclosed block (which may contain awaits)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, **labels)
+
+    async def timed(self, name: str, awaitable: Awaitable[T], **labels: Any) -> T:
+        """Await ``awaitable`` and time it — for phases run inside a gather."""
+        with self.phase(name, **labels):
+            return await awaitable
+
+    def percentile(self, name: str, q: float, **labels: Any) -> float | None:
+        histogram = self.histograms.get(metric_key(name, **labels))
+        if histogram is None or not histogram.count:
+            return None
+        return histogram.percentile(q)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "sandbox_id": self.sandbox_id,
+            "phases": {key: h.summary() for key, h in sorted(self.histograms.items())},
+        }
+
+    def due(self) -> bool:
+        """True once per ``emit_interval``; resets the interval when it fires."""
+        now = time.monotonic()
+        if now - self._last_emit < self.emit_interval:
+            return False
+        self._last_emit = now
+        return True
+
+    def dump(self, path: str | None = None) -> None:
+        """Write the snapshot to a local JSON file (atomically)."""
+        path = path or self.dump_path
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to write metrics to %s: %s", path, e)
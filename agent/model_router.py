@@ -1,17 +1,142 @@
 """Model-agnostic router with fallback chain support.
 
 Provides a unified interface regardless of LLM provider, plus automatic
-fallback to alternative providers on rate limits or API errors.
+fallback to alternative providers on rate limits or API errors. The router
+tracks each provider's health. Providers that keep failing are skipped by a
+circuit breaker, and fallbacks are ordered by observed error rate and
+latency. One router can be shared by every agent in a process.
+
+``CascadePolicy`` decides when a step answered by a cheap model has to be
+re-run on the sandbox's primary model.
 """
 
 import logging
-from typing import Any
+import time
+from typing import Any, Callable
 
 from base import BaseProvider, Decision
+from tools.schemas import validate_tool_call
 
 logger = logging.getLogger(__name__)
 
 
+class ProviderHealth:
+    """EWMA error rate / latency plus a circuit breaker for one provider.
+
+    The breaker opens after ``failure_threshold`` consecutive failures.
+    After ``cooldown`` seconds it is half-open, and one probe request per
+    ``cooldown`` gets through. A successful probe closes it, and a failed one
+    re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0, alpha: float = 0.2):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.error_rate = 0.0
+        self.latency: float | None = None
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._last_probe = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open":
+            return False
+        now = time.monotonic()
+        if now - self._last_probe < self.cooldown:
+            return False
+        self._last_probe = now
+        return True
+
+    def record_success(self, latency: float) -> None:
+        self.error_rate *= 1 - self.alpha
+        self.latency = latency if self.latency is None else (
+            self.alpha * latency + (1 - self.alpha) * self.latency
+        )
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def sort_key(self) -> tuple[int, float, float]:
+        rank = {"closed": 0, "half_open": 1, "open": 2}[self.state]
+        return (rank, round(self.error_rate, 1), self.latency or 0.0)
+
+
+class CascadePolicy:
+    """Send steps to a cheap model first and escalate risky ones to the primary.
+
+    The cheap model's decision is kept unless it picks a high-stakes tool
+    or submits a plan, makes an invalid tool call, asks to stop, returns no
+    response, or repeats a recent action. Head-to-head sandboxes skip the cascade, so
+    every decision spectators see comes from the model that was entered.
+    """
+
+    # A plan commits to several actions without another think call.
+    HIGH_STAKES_TOOLS = frozenset({"send_usdc", "send_usdc_email", "send_email", "submit_plan"})
+
+    def __init__(self, cheap_key: str = "gemini-2-flash"):
+        self.cheap_key = cheap_key
+        self.steps = 0
+        self.escalations: dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, sandbox_config: dict) -> "CascadePolicy | None":
+        """The policy for a sandbox, or None when it should always use its primary."""
+        if not sandbox_config.get("cascade", False) or sandbox_config.get("head_to_head", False):
+            return None
+        cheap_key = sandbox_config.get("cascade_model", "gemini-2-flash")
+        if cheap_key == sandbox_config["model"]:
+            return None
+        return cls(cheap_key)
+
+    def escalation_reason(
+        self,
+        decision: Decision,
+        repeats: Callable[[str, dict], bool] | None = None,
+    ) -> str | None:
+        """Why ``decision`` from the cheap model needs the primary, or None to keep it."""
+        self.steps += 1
+        reason = self._reason(decision, repeats)
+        if reason is not None:
+            kind = reason.split(":", 1)[0]
+            self.escalations[kind] = self.escalations.get(kind, 0) + 1
+        return reason
+
+    def _reason(self, decision: Decision, repeats: Callable[[str, dict], bool] | None) -> str | None:
+        if not decision.raw_assistant_message:
+            return "no_response"
+        for call in decision.calls():
+            if call.name in self.HIGH_STAKES_TOOLS:
+                return f"high_stakes: {call.name}"
+            error = validate_tool_call(call.name, call.input)
+            if error is not None:
+                return f"invalid_call: {error}"
+            if call.name == "finish_reasoning" and call.input.get("should_stop"):
+                return "stop: cheap model wants to end the run"
+            if repeats is not None and repeats(call.name, call.input):
+                return f"repeat: {call.name}"
+        return None
+
+    def escalation_rate(self) -> float:
+        return sum(self.escalations.values()) / self.steps if self.steps else 0.0
+
+
 class ModelRouter:
     MODEL_IDS: dict[str, str] = {
         "claude-sonnet": "claude-sonnet-4-5",
@@ -27,9 +152,43 @@ class ModelRouter:
         "gemini-2-flash": ("providers.gemini_provider", "GeminiProvider"),
     }
 
+    CONTEXT_WINDOWS: dict[str, int] = {
+        "claude-sonnet": 200_000,
+        "claude-opus": 200_000,
+        "gpt-4o": 128_000,
+        "gemini-2-flash": 1_048_576,
+    }
+
     FALLBACK_ORDER: list[str] = ["claude-sonnet", "gpt-4o", "gemini-2-flash"]
 
+    def __init__(self):
+        self._providers: dict[str, BaseProvider] = {}
+        self.health: dict[str, ProviderHealth] = {}
+
+    def health_of(self, model_key: str) -> ProviderHealth:
+        if model_key not in self.health:
+            self.health[model_key] = ProviderHealth()
+        return self.health[model_key]
+
+    def record_success(self, provider: BaseProvider, latency: float) -> None:
+        self.health_of(provider.model_key).record_success(latency)
+
+    def record_failure(self, provider: BaseProvider) -> None:
+        health = self.health_of(provider.model_key)
+        was_open = health.state != "closed"
+        health.record_failure()
+        if health.state == "open" and not was_open:
+            logger.warning("Circuit opened for %s after %d consecutive failures",
+                           provider.model_key, health.consecutive_failures)
+
     def get(self, model_key: str) -> BaseProvider:
+        """Return the provider for ``model_key``, constructing it on first use.
+
+        Providers hold only their SDK client, so one instance is shared by
+        every agent using this router.
+        """
+        if model_key in self._providers:
+            return self._providers[model_key]
         entry = self.PROVIDER_MODULES.get(model_key)
         if entry is None:
             raise ValueError(f"Unknown model: {model_key}. Options: {list(self.PROVIDER_MODULES.keys())}")
@@ -37,20 +196,67 @@ class ModelRouter:
         import importlib
         mod = importlib.import_module(module_path)
         provider_cls = getattr(mod, class_name)
-        model_id = self.MODEL_IDS[model_key]
-        return provider_cls(model_id=model_id)
+        provider = provider_cls(model_id=self.MODEL_IDS[model_key])
+        self.register(model_key, provider)
+        return provider
+
+    def register(self, model_key: str, provider: BaseProvider) -> None:
+        """Serve ``provider`` for ``model_key`` (e.g. a replay or mock provider)."""
+        provider.model_key = model_key
+        provider.context_window = self.CONTEXT_WINDOWS.get(model_key, provider.context_window)
+        self._providers[model_key] = provider
+
+    def get_cascade_chain(self, cheap_key: str) -> list[BaseProvider]:
+        """The cheap model alone, with no fallbacks; empty if it is unavailable.
+
+        A failed cheap attempt escalates to the primary's full chain, so
+        falling back here would only add latency.
+        """
+        if self.health_of(cheap_key).state == "open":
+            return []
+        try:
+            return [self.get(cheap_key)]
+        except Exception as e:
+            logger.debug("Cascade model %s unavailable: %s", cheap_key, e)
+            return []
 
     def get_fallback_chain(self, primary_key: str) -> list[BaseProvider]:
         """Return a list of providers: primary first, then fallbacks.
 
         Example: get_fallback_chain("claude-sonnet") returns
         [AnthropicProvider, OpenAIProvider, GeminiProvider]
+
+        Fallbacks are ordered by health. Providers with an open circuit are
+        left out, unless that would leave the chain empty. A half-open
+        fallback is only included when it is granted the breaker's single
+        probe, so agents sharing the router don't all hit a recovering
+        provider at once. An unhealthy primary moves behind the healthy
+        fallbacks.
         """
-        chain = [self.get(primary_key)]
-        for key in self.FALLBACK_ORDER:
-            if key != primary_key and key in self.PROVIDER_MODULES:
-                try:
-                    chain.append(self.get(key))
-                except Exception:
-                    logger.debug("Skipping fallback %s (init failed)", key)
-        return chain
+        fallback_keys = sorted(
+            (k for k in self.FALLBACK_ORDER if k != primary_key and k in self.PROVIDER_MODULES),
+            key=lambda k: self.health_of(k).sort_key(),
+        )
+        if self.health_of(primary_key).allow_request():
+            keys = [primary_key] + fallback_keys
+        else:
+            keys = fallback_keys + [primary_key]
+
+        chain: list[BaseProvider] = []
+        skipped: list[BaseProvider] = []
+        for key in keys:
+            try:
+                provider = self.get(key)
+            except Exception:
+                if key == primary_key:
+                    raise
+                logger.debug("Skipping fallback %s (init failed)", key)
+                continue
+            health = self.health_of(key)
+            if key == primary_key or health.state == "closed" or (
+                health.state == "half_open" and health.allow_request()
+            ):
+                chain.append(provider)
+            else:
+                skipped.append(provider)
+        return chain or skipped
@@ -0,0 +1,109 @@
+"""Adaptive step pacing — spreads the credit budget over the remaining time.
+
+Replaces the fixed one-second sleep between agent steps. The pacer aims for
+a steady spend rate of ``credits / remaining_seconds``: after an expensive
+step it waits longer, after a cheap one it continues immediately. Provider
+rate limits push it into exponential backoff, and new user input wakes it
+early.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_SIGNALS = ("rate limit", "rate_limit", "too many requests", "resource_exhausted", "429")
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Best-effort check for a provider 429 across the three SDKs."""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(signal in text for signal in RATE_LIMIT_SIGNALS)
+
+
+class StepPacer:
+    """Decides how long the agent loop waits between steps."""
+
+    def __init__(
+        self,
+        min_delay: float = 0.0,
+        max_delay: float = 30.0,
+        backoff_base: float = 2.0,
+        backoff_max: float = 60.0,
+    ):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._rate_limited = False
+        self._rate_limit_streak = 0
+        self._wake = asyncio.Event()
+
+    def record_rate_limit(self) -> None:
+        """Note that a provider rate-limited us during the current step."""
+        self._rate_limited = True
+
+    def wake(self) -> None:
+        """Cut the current (or next) sleep short — new input has arrived."""
+        self._wake.set()
+
+    def next_delay(
+        self,
+        credits: float,
+        remaining_seconds: float,
+        step_cost: float,
+        step_duration: float,
+        action_type: str = "",
+    ) -> float:
+        """Return the pause before the next step, in seconds."""
+        if self._rate_limited:
+            self._rate_limited = False
+            self._rate_limit_streak += 1
+            delay = min(
+                self.backoff_max,
+                self.backoff_base * 2 ** (self._rate_limit_streak - 1),
+            )
+            logger.info("Rate limited %d step(s) in a row — backing off %.1fs",
+                        self._rate_limit_streak, delay)
+            return delay
+        self._rate_limit_streak = 0
+
+        if action_type == "finish_reasoning":
+            return 0.0
+        if credits <= 0 or remaining_seconds <= 0 or step_cost <= 0:
+            return self.min_delay
+
+        spend_rate = credits / remaining_seconds
+        target_interval = step_cost / spend_rate
+        delay = target_interval - step_duration
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    async def sleep(
+        self,
+        delay: float,
+        watcher: Callable[["StepPacer"], Awaitable[None]] | None = None,
+    ) -> bool:
+        """Sleep for ``delay`` seconds unless woken. Returns True if woken early.
+
+        ``watcher`` runs for the duration of the sleep and may call
+        :meth:`wake` when it sees new input.
+        """
+        if self._wake.is_set():
+            self._wake.clear()
+            return True
+        if delay <= 0:
+            return False
+
+        watch_task = asyncio.create_task(watcher(self)) if watcher else None
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._wake.clear()
+            if watch_task is not None:
+                watch_task.cancel()
@@ -0,0 +1,106 @@
+"""Plan mode — run a short, guarded sequence of tool calls per think call.
+
+With plan mode on, the model can answer with ``submit_plan``: an ordered
+list of up to ``max_steps`` tool calls, each with a guard on the previous
+step's result. The runtime runs the steps back-to-back and only asks the
+model again when a guard fails, a step errors, a user prompt arrives, time
+runs out, or the plan ends. The plan's tool_result reports every step that
+ran, so the model picks up exactly where the plan stopped.
+
+Guards:
+  ``previous_ok`` (default)   the previous step did not error or get blocked
+  ``always``                  run regardless of the previous result
+  ``previous_contains:TEXT``  the previous result mentions TEXT (case-insensitive)
+  ``previous_lacks:TEXT``     the previous result does not mention TEXT
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from base import ToolCall
+from tools.schemas import PLANNABLE_TOOLS, validate_tool_call
+
+logger = logging.getLogger(__name__)
+
+FAILED_STATUSES = frozenset({"error", "blocked", "failed"})
+
+
+@dataclass
+class PlanStep:
+    call: ToolCall
+    guard: str = "previous_ok"
+
+
+def parse_plan(plan_call: ToolCall, max_steps: int) -> tuple[list[PlanStep], str | None]:
+    """The validated steps of a ``submit_plan`` call, or an error for the model."""
+    raw_steps = plan_call.input.get("steps")
+    if not isinstance(raw_steps, list) or not raw_steps:
+        return [], "submit_plan needs a non-empty 'steps' list"
+    if len(raw_steps) > max_steps:
+        logger.info("Plan has %d steps; running the first %d", len(raw_steps), max_steps)
+        raw_steps = raw_steps[:max_steps]
+
+    steps: list[PlanStep] = []
+    for index, raw in enumerate(raw_steps):
+        if not isinstance(raw, dict):
+            return [], f"plan step {index} is not an object"
+        tool = raw.get("tool", "")
+        if tool not in PLANNABLE_TOOLS:
+            return [], f"plan step {index}: '{tool}' can't be planned (use one of {sorted(PLANNABLE_TOOLS)})"
+        arguments = raw.get("arguments") or {}
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                return [], f"plan step {index}: 'arguments' is not valid JSON"
+        error = validate_tool_call(tool, arguments)
+        if error is not None:
+            return [], f"plan step {index}: {error}"
+        guard = str(raw.get("guard") or "previous_ok")
+        if guard_failure(guard, {}) == "unknown guard":
+            return [], f"plan step {index}: unknown guard '{guard}'"
+        steps.append(PlanStep(ToolCall(id=f"{plan_call.id}-{index}", name=tool, input=arguments), guard))
+    return steps, None
+
+
+def guard_failure(guard: str, previous: Any) -> str | None:
+    """Why ``guard`` stops the plan given the previous step's result, or None to go on."""
+    kind, _, text = guard.partition(":")
+    if kind == "always":
+        return None
+    if kind == "previous_ok":
+        status = previous.get("status") if isinstance(previous, dict) else None
+        if status in FAILED_STATUSES or (isinstance(previous, dict) and previous.get("error")):
+            return "previous step failed"
+        return None
+    if kind in ("previous_contains", "previous_lacks") and text:
+        found = text.lower() in json.dumps(previous, default=str).lower()
+        if kind == "previous_contains" and not found:
+            return f"previous result doesn't mention '{text}'"
+        if kind == "previous_lacks" and found:
+            return f"previous result mentions '{text}'"
+        return None
+    return "unknown guard"
+
+
+async def execute_plan(
+    steps: list[PlanStep],
+    run_call: Callable[[ToolCall], Awaitable[Any]],
+    interrupted: Callable[[], Awaitable[str | None]],
+) -> tuple[list[tuple[ToolCall, Any]], str | None]:
+    """Run ``steps`` in order until one's guard fails or ``interrupted`` gives a reason.
+
+    Returns the (call, result) pairs that ran and why the plan stopped early,
+    or None if it ran to the end. The first step always runs.
+    """
+    executed: list[tuple[ToolCall, Any]] = []
+    for index, step in enumerate(steps):
+        if index > 0:
+            reason = guard_failure(step.guard, executed[-1][1]) or await interrupted()
+            if reason is not None:
+                logger.info("Plan stopped before step %d of %d: %s", index + 1, len(steps), reason)
+                return executed, reason
+        executed.append((step.call, await run_call(step.call)))
+    return executed, None
@@ -0,0 +1,119 @@
+"""Per-model token pricing and the per-sandbox cost ledger.
+
+Providers price each response from its reported token usage, including
+prompt-cache reads and writes, which are billed at different rates than
+plain input. The ledger adds LLM, browser and payment spend together, and
+the loop checks that total against the sandbox's budget.
+"""
+
+import logging
+from typing import Any
+
+from base import Decision
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens.
+MODEL_PRICES: dict[str, dict[str, float]] = {
+    "claude-sonnet-4-5": {"input": 3.00, "output": 15.00, "cache_read": 0.30, "cache_write": 3.75},
+    "claude-opus-4-6": {"input": 5.00, "output": 25.00, "cache_read": 0.50, "cache_write": 6.25},
+    "gpt-4o": {"input": 2.50, "output": 10.00, "cache_read": 1.25, "cache_write": 2.50},
+    "gemini-2.0-flash": {"input": 0.10, "output": 0.40, "cache_read": 0.025, "cache_write": 0.10},
+}
+
+# Ledger phases that count against the compute budget. Payments move the
+# agent's own wallet funds toward its goal and are tracked separately.
+COMPUTE_PHASES = frozenset({"think", "hedge", "browser", "summary"})
+
+# Payment statuses (lowercased) under which no funds moved. Locus reports
+# accepted transfers as e.g. "QUEUED" or "SUCCESS"; the runtime itself
+# returns "error" and "blocked".
+UNSPENT_PAYMENT_STATUSES = frozenset({
+    "error", "blocked", "failed", "rejected", "policy_rejected", "cancelled", "canceled", "expired",
+})
+
+
+def token_cost(model_id: str, usage: dict[str, int]) -> float | None:
+    """USD cost of one response, or None if the model or usage is unknown."""
+    prices = MODEL_PRICES.get(model_id)
+    if prices is None or not usage:
+        return None
+    return (
+        usage.get("input_tokens", 0) * prices["input"]
+        + usage.get("output_tokens", 0) * prices["output"]
+        + usage.get("cache_read_tokens", 0) * prices["cache_read"]
+        + usage.get("cache_write_tokens", 0) * prices["cache_write"]
+    ) / 1_000_000
+
+
+def price_decision(decision: Decision, model_id: str) -> Decision:
+    """Set ``decision.cost`` from its usage; keeps the flat estimate if there is none."""
+    cost = token_cost(model_id, decision.usage)
+    if cost is None:
+        logger.debug("No usage or price for %s — keeping estimated cost %.4f", model_id, decision.cost)
+    else:
+        decision.cost = cost
+    return decision
+
+
+def payment_settled(result: dict[str, Any]) -> bool:
+    """True if a payment result moved (or committed) funds, whatever the Locus status casing."""
+    status = str(result.get("status") or "").lower()
+    return bool(status) and status not in UNSPENT_PAYMENT_STATUSES and not result.get("error")
+
+
+def result_cost(action_type: str, action: dict[str, Any], result: Any) -> tuple[str, float] | None:
+    """The ledger phase and USD amount a tool result spent, if any."""
+    if not isinstance(result, dict):
+        return None
+    if action_type == "browser_task":
+        try:
+            cost = float(result.get("cost_usd") or 0)
+        except (TypeError, ValueError):
+            return None
+        return ("browser", cost) if cost > 0 else None
+    if action_type in ("send_usdc", "send_usdc_email") and payment_settled(result):
+        try:
+            amount = float(action.get("amount") or 0)
+        except (TypeError, ValueError):
+            return None
+        return ("payments", amount) if amount > 0 else None
+    return None
+
+
+class CostLedger:
+    """Running USD spend for one sandbox, broken down by phase and label."""
+
+    def __init__(self, budget_usd: float, entries: dict[str, float] | None = None):
+        self.budget_usd = budget_usd
+        self.entries: dict[str, float] = dict(entries or {})
+
+    def charge(self, phase: str, usd: float, label: str = "") -> None:
+        if usd <= 0:
+            return
+        key = f"{phase}:{label}" if label else phase
+        self.entries[key] = self.entries.get(key, 0.0) + usd
+
+    def by_phase(self) -> dict[str, float]:
+        phases: dict[str, float] = {}
+        for key, usd in self.entries.items():
+            phase = key.split(":", 1)[0]
+            phases[phase] = phases.get(phase, 0.0) + usd
+        return phases
+
+    @property
+    def compute_spent(self) -> float:
+        return sum(usd for phase, usd in self.by_phase().items() if phase in COMPUTE_PHASES)
+
+    @property
+    def remaining(self) -> float:
+        return self.budget_usd - self.compute_spent
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "budget_usd": round(self.budget_usd, 6),
+            "spent_usd": round(self.compute_spent, 6),
+            "remaining_usd": round(self.remaining, 6),
+            "by_phase": {k: round(v, 6) for k, v in sorted(self.by_phase().items())},
+            "entries": {k: round(v, 6) for k, v in sorted(self.entries.items())},
+        }
@@ -13,6 +13,7 @@ to accomplish. The browser automation system handles clicking, typing, and navig
 - send_email: Send emails from your dedicated agent email address (via AgentMail).
 - send_usdc: Send USDC cryptocurrency to a Base wallet address.
 - send_usdc_email: Send USDC to someone via their email (held in escrow until claimed).
+- fetch_result: Read more of an earlier result that was summarized (it has a _ref).
 - finish_reasoning: Think through strategy without taking an external action. \
 Set should_stop=true when you believe the goal is achieved.
 
@@ -20,6 +21,7 @@ Strategy guidelines:
 - Break complex goals into smaller, verifiable steps.
 - After each action, assess whether it moved you closer to the goal.
 - If you're stuck or repeating yourself, try a completely different approach.
+- Independent actions can be issued together in one turn; they run in parallel.
 - Use browser_task with clear, specific instructions \
 (e.g. "Go to twitter.com and post a tweet about AI agents").
 - You are being watched live — spectators can see your browser and bet on your success.
@@ -70,6 +72,15 @@ def build_user_prompt(goal: str, **context: Any) -> str:
     if context.get("stuck_hint"):
         parts.append(f"WARNING: {context['stuck_hint']}")
 
-    parts.append("\nDecide your next action. Use exactly one tool.")
+    if context.get("plan_steps"):
+        parts.append(
+            f"PLAN MODE: for a predictable sequence, call submit_plan with up to "
+            f"{context['plan_steps']} steps; they run without another think step."
+        )
+
+    parts.append(
+        "\nDecide your next action. If several actions are independent of each "
+        "other (e.g. emails to different people), call all of those tools at once."
+    )
 
     return "\n\n".join(parts)
@@ -1,56 +1,152 @@
-"""Anthropic Claude provider — uses native tool use API with multi-turn history."""
+"""Anthropic Claude provider — uses native tool use API with multi-turn history.
 
+Requests use prompt caching: the tool definitions, the system prompt and
+the conversation up to the previous step are marked with cache breakpoints,
+so each step only pays full price for what changed since the last one.
+"""
+
+import logging
 import os
+from functools import cached_property
 from typing import Any
 
-import anthropic
-
-from base import BaseProvider, Decision
+from base import BaseProvider, Decision, ToolCall
+from history import is_turn_start
+from pricing import price_decision
 from prompts import SYSTEM_PROMPT
 from tools.schemas import to_anthropic_tools
 
+logger = logging.getLogger(__name__)
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
 
 class AnthropicProvider(BaseProvider):
+    chars_per_token = 3.5
+
     def __init__(self, model_id: str = "claude-sonnet-4-5"):
-        self.client = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+        self.api_key = os.environ["ANTHROPIC_API_KEY"]
         self.model_id = model_id
+        self.system = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+        self.tools = _with_cached_tools(to_anthropic_tools())
+        self.plan_tools = _with_cached_tools(to_anthropic_tools(plan=True))
+
+    @cached_property
+    def client(self) -> Any:
+        """SDK client, imported and built on the first request."""
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=self.api_key)
 
     async def think(self, messages: list[dict[str, Any]], **context: Any) -> Decision:
+        request = {
+            "model": self.model_id,
+            "max_tokens": 4096,
+            "system": self.system,
+            "tools": self.plan_tools if context.get("plan") else self.tools,
+            "messages": _with_cache_breakpoints(messages),
+        }
+        stream = context.get("stream")
+        if stream is None:
+            response = await self.client.messages.create(**request)
+        else:
+            response = await self._stream(request, stream)
+
+        decision = _parse_tool_use(response)
+        decision.usage = _read_usage(response)
+        price_decision(decision, self.model_id)
+        logger.debug(
+            "Anthropic cache: %d read, %d written, %d uncached input tokens",
+            decision.usage.get("cache_read_tokens", 0),
+            decision.usage.get("cache_write_tokens", 0),
+            decision.usage.get("input_tokens", 0),
+        )
+        return decision
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
         response = await self.client.messages.create(
             model=self.model_id,
-            max_tokens=4096,
-            system=SYSTEM_PROMPT,
-            tools=to_anthropic_tools(),
-            messages=messages,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}],
         )
+        text = "".join(block.text for block in response.content if block.type == "text")
+        decision = Decision(reasoning=text, action_type="", action={}, cost=0.0, usage=_read_usage(response))
+        return price_decision(decision, self.model_id)
 
-        return _parse_tool_use(response)
+    async def _stream(self, request: dict[str, Any], stream: Any) -> Any:
+        """Stream the response, forwarding text deltas and finished tool calls."""
+        async with self.client.messages.stream(**request) as events:
+            async for event in events:
+                if event.type == "text":
+                    stream.on_text(event.text)
+                elif event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    block = event.content_block
+                    stream.on_tool_call(ToolCall(id=block.id, name=block.name, input=block.input))
+            return await events.get_final_message()
 
 
-def _parse_tool_use(response: Any) -> Decision:
-    """Extract the tool call from Anthropic's response content blocks."""
-    reasoning_parts: list[str] = []
-    tool_name = "finish_reasoning"
-    tool_input: dict[str, Any] = {}
-    tool_use_id = ""
+def _with_cached_tools(tools: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    tools[-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+    return tools
 
-    for block in response.content:
-        if block.type == "text":
-            reasoning_parts.append(block.text)
-        elif block.type == "tool_use":
-            tool_name = block.name
-            tool_input = block.input
-            tool_use_id = block.id
 
-    reasoning = " ".join(reasoning_parts)
-    if tool_name == "finish_reasoning":
-        reasoning = tool_input.get("reasoning", reasoning)
+def _with_cache_breakpoints(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return a copy of ``messages`` with cache breakpoints on two messages.
+
+    One breakpoint goes on the last message, so this request writes the whole
+    prefix to the cache. The other goes on the message just before the newest
+    step began, which is the prefix the previous request wrote, so this
+    request reads it. The caller's messages are not modified.
+    """
+    if not messages:
+        return messages
+
+    marked = list(messages)
+    last = len(marked) - 1
+    previous = next(
+        (i - 1 for i in range(last, 0, -1) if is_turn_start(marked[i])),
+        None,
+    )
+    for index in {last, previous} - {None}:
+        marked[index] = _mark_last_block(marked[index])
+    return marked
+
+
+def _mark_last_block(message: dict[str, Any]) -> dict[str, Any]:
+    content = message.get("content")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content}]
+    elif isinstance(content, list) and content:
+        blocks = list(content)
+    else:
+        return message
+    blocks[-1] = {**blocks[-1], "cache_control": CACHE_CONTROL}
+    return {**message, "content": blocks}
+
+
+def _read_usage(response: Any) -> dict[str, int]:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        "cache_read_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+    }
 
+
+def _parse_tool_use(response: Any) -> Decision:
+    """Extract the tool calls from Anthropic's response content blocks."""
+    reasoning_parts: list[str] = []
+    tool_calls: list[ToolCall] = []
     raw_content = []
+
     for block in response.content:
         if block.type == "text":
+            reasoning_parts.append(block.text)
             raw_content.append({"type": "text", "text": block.text})
         elif block.type == "tool_use":
+            tool_calls.append(ToolCall(id=block.id, name=block.name, input=block.input))
             raw_content.append({
                 "type": "tool_use",
                 "id": block.id,
@@ -58,11 +154,17 @@ def _parse_tool_use(response: Any) -> Decision:
                 "input": block.input,
             })
 
+    primary = tool_calls[0] if tool_calls else ToolCall(id="", name="finish_reasoning", input={})
+    reasoning = " ".join(reasoning_parts)
+    if primary.name == "finish_reasoning":
+        reasoning = primary.input.get("reasoning", reasoning)
+
     return Decision(
         reasoning=reasoning,
-        action_type=tool_name,
-        action=tool_input,
+        action_type=primary.name,
+        action=primary.input,
         cost=0.01,
-        tool_use_id=tool_use_id,
+        tool_use_id=primary.id,
         raw_assistant_message={"role": "assistant", "content": raw_content},
+        tool_calls=tool_calls,
     )
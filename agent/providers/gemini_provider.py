@@ -1,89 +1,208 @@
-"""Google Gemini provider — uses native function calling API.
+"""Google Gemini provider — uses native function calling API with multi-turn history.
 
-Gemini's chat API doesn't map cleanly to the Anthropic message format, so
-we extract only the latest user message from the history for each call.
-Multi-turn context is preserved via the action_history in the prompt text.
+History is converted to Gemini ``Content`` dicts by an incremental encoder.
+Gemini matches function responses to calls by name, not id, so the encoder
+remembers the name behind each tool call id it has encoded.
 """
 
-import base64
-import io
+import json
 import os
 import uuid
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from functools import cached_property
 from typing import Any
 
-import google.generativeai as genai
-from PIL import Image
-
-from base import BaseProvider, Decision
+from base import BaseProvider, Decision, IncrementalEncoder, IRMessage, ToolCall
+from pricing import price_decision
 from prompts import SYSTEM_PROMPT
 from tools.schemas import to_gemini_tools
 
 
 class GeminiProvider(BaseProvider):
     def __init__(self, model_id: str = "gemini-2.0-flash"):
-        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-        self.model = genai.GenerativeModel(
-            model_id,
+        self.api_key = os.environ["GOOGLE_API_KEY"]
+        self.model_id = model_id
+        self.encoder = GeminiEncoder()
+
+    @cached_property
+    def model(self) -> Any:
+        """SDK model, with its FunctionDeclarations, built on the first request."""
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        return genai.GenerativeModel(
+            self.model_id,
             system_instruction=SYSTEM_PROMPT,
             tools=to_gemini_tools(),
         )
 
+    @cached_property
+    def plan_tools(self) -> list[Any]:
+        return to_gemini_tools(plan=True)
+
     async def think(self, messages: list[dict[str, Any]], **context: Any) -> Decision:
-        last_user = ""
-        for msg in reversed(messages):
-            if msg["role"] == "user":
-                content = msg["content"]
-                if isinstance(content, str):
-                    last_user = content
-                elif isinstance(content, list):
-                    last_user = " ".join(
-                        c.get("text", c.get("content", ""))
-                        for c in content
-                        if isinstance(c, dict) and c.get("type") in ("text", "tool_result")
-                    )
-                break
-
-        parts: list[Any] = [last_user or "Continue working toward the goal."]
-        response = await self.model.generate_content_async(parts)
-        return _parse_function_call(response)
+        contents: list[Any] = self.encoder.encode(messages) or ["Continue working toward the goal."]
+        # The model's own tool list is the default; plan mode overrides it per request.
+        request: dict[str, Any] = {"tools": self.plan_tools} if context.get("plan") else {}
+        stream = context.get("stream")
+        if stream is not None:
+            decision = await self._stream(contents, stream, request)
+        else:
+            response = await self.model.generate_content_async(contents, **request)
+            decision = _parse_function_call(response)
+            decision.usage = _read_usage(getattr(response, "usage_metadata", None))
+        return price_decision(decision, self.model_id)
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
+        response = await self.model.generate_content_async(
+            prompt,
+            tool_config={"function_calling_config": {"mode": "none"}},
+            generation_config={"max_output_tokens": max_tokens},
+        )
+        text = "".join(
+            part.text
+            for candidate in response.candidates
+            for part in candidate.content.parts
+            if getattr(part, "text", None)
+        )
+        decision = Decision(reasoning=text, action_type="", action={}, cost=0.0)
+        decision.usage = _read_usage(getattr(response, "usage_metadata", None))
+        return price_decision(decision, self.model_id)
+
+    async def _stream(self, contents: list[Any], stream: Any, request: dict[str, Any]) -> Decision:
+        """Stream the response; Gemini sends each function call whole."""
+        reasoning = ""
+        tool_calls: list[ToolCall] = []
+        usage = None
+        response = await self.model.generate_content_async(contents, stream=True, **request)
+        async for chunk in response:
+            # Each chunk's usage_metadata is cumulative; keep the latest.
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            for candidate in chunk.candidates:
+                for part in candidate.content.parts:
+                    if hasattr(part, "text") and part.text:
+                        reasoning += part.text
+                        stream.on_text(part.text)
+                    if hasattr(part, "function_call") and part.function_call:
+                        call = _to_tool_call(part.function_call)
+                        tool_calls.append(call)
+                        stream.on_tool_call(call)
+        decision = _build_decision(reasoning, tool_calls)
+        decision.usage = _read_usage(usage)
+        return decision
+
+
+class GeminiEncoder(IncrementalEncoder):
+    """IR messages to Gemini ``Content`` dicts (roles ``user`` and ``model``)."""
+
+    def __init__(self, max_entries: int = 4096):
+        super().__init__(max_entries)
+        # tool call id -> function name, for encoding the matching responses.
+        self._call_names: OrderedDict[str, str] = OrderedDict()
+
+    def encode_message(self, message: IRMessage) -> list[dict[str, Any]]:
+        parts: list[dict[str, Any]] = []
+        for part in message.parts:
+            if part.kind == "text" and part.text:
+                parts.append({"text": part.text})
+            elif part.kind == "tool_call":
+                self._call_names[part.call_id] = part.name
+                if len(self._call_names) > self.max_entries:
+                    self._call_names.popitem(last=False)
+                parts.append({"function_call": {"name": part.name, "args": part.input}})
+            elif part.kind == "tool_result":
+                parts.append({"function_response": {
+                    "name": self._call_names.get(part.call_id, "tool"),
+                    "response": _response_struct(part.text),
+                }})
+        if not parts:
+            return []
+        return [{"role": "model" if message.role == "assistant" else "user", "parts": parts}]
+
+    def finish(self, encoded: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Merge consecutive same-role contents; Gemini expects turns to alternate."""
+        merged: list[dict[str, Any]] = []
+        for content in encoded:
+            if merged and merged[-1]["role"] == content["role"]:
+                merged[-1] = {"role": content["role"], "parts": merged[-1]["parts"] + content["parts"]}
+            else:
+                merged.append(content)
+        return merged
+
+
+def _response_struct(text: str) -> dict[str, Any]:
+    """A function response must be an object; tool results are usually JSON ones."""
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return {"result": text}
+    return value if isinstance(value, dict) else {"result": value}
+
+
+def _read_usage(metadata: Any) -> dict[str, int]:
+    """Token counts from Gemini's usage_metadata; cached tokens are split out of the prompt."""
+    if metadata is None:
+        return {}
+    prompt = getattr(metadata, "prompt_token_count", 0) or 0
+    cached = getattr(metadata, "cached_content_token_count", 0) or 0
+    return {
+        "input_tokens": prompt - cached,
+        "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+        "cache_read_tokens": cached,
+        "cache_write_tokens": 0,
+    }
 
 
 def _parse_function_call(response: Any) -> Decision:
-    """Extract the function call from Gemini's response."""
+    """Extract the function calls from Gemini's response."""
     reasoning = ""
-    tool_name = "finish_reasoning"
-    tool_input: dict[str, Any] = {}
-    tool_use_id = ""
+    tool_calls: list[ToolCall] = []
 
     for candidate in response.candidates:
         for part in candidate.content.parts:
             if hasattr(part, "text") and part.text:
                 reasoning += part.text
             if hasattr(part, "function_call") and part.function_call:
-                fc = part.function_call
-                tool_name = fc.name
-                tool_input = dict(fc.args) if fc.args else {}
-                tool_use_id = str(uuid.uuid4())
+                tool_calls.append(_to_tool_call(part.function_call))
+
+    return _build_decision(reasoning, tool_calls)
+
+
+def _to_tool_call(fc: Any) -> ToolCall:
+    return ToolCall(id=str(uuid.uuid4()), name=fc.name, input=_plain(fc.args) if fc.args else {})
+
+
+def _plain(value: Any) -> Any:
+    """Proto ``MapComposite``/``RepeatedComposite`` args, at any depth, as dicts and lists."""
+    if isinstance(value, Mapping):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        return [_plain(v) for v in value]
+    return value
+
 
-    if tool_name == "finish_reasoning":
-        reasoning = tool_input.get("reasoning", reasoning)
+def _build_decision(reasoning: str, tool_calls: list[ToolCall]) -> Decision:
+    primary = tool_calls[0] if tool_calls else ToolCall(id="", name="finish_reasoning", input={})
+    if primary.name == "finish_reasoning":
+        reasoning = primary.input.get("reasoning", reasoning)
 
     raw_content: list[dict[str, Any]] = []
     if reasoning:
         raw_content.append({"type": "text", "text": reasoning})
-    if tool_name != "finish_reasoning" or tool_input:
+    for call in tool_calls:
         raw_content.append({
             "type": "tool_use",
-            "id": tool_use_id,
-            "name": tool_name,
-            "input": tool_input,
+            "id": call.id,
+            "name": call.name,
+            "input": call.input,
         })
 
     return Decision(
         reasoning=reasoning,
-        action_type=tool_name,
-        action=tool_input,
+        action_type=primary.name,
+        action=primary.input,
         cost=0.005,
-        tool_use_id=tool_use_id,
+        tool_use_id=primary.id,
         raw_assistant_message={"role": "assistant", "content": raw_content},
+        tool_calls=tool_calls,
     )
@@ -1,115 +1,232 @@
-"""OpenAI GPT provider — uses native function calling API with multi-turn history."""
+"""OpenAI GPT provider — uses native function calling API with multi-turn history.
+
+History is converted to chat messages by an incremental encoder, so each
+step only converts the messages added since the previous one.
+"""
 
 import json
 import os
+from functools import cached_property
 from typing import Any
 
-import openai
-
-from base import BaseProvider, Decision
+from base import BaseProvider, Decision, IncrementalEncoder, IRMessage, ToolCall
+from pricing import price_decision
 from prompts import SYSTEM_PROMPT
 from tools.schemas import to_openai_tools
 
 
 class OpenAIProvider(BaseProvider):
     def __init__(self, model_id: str = "gpt-4o"):
-        self.client = openai.AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"])
+        self.api_key = os.environ["OPENAI_API_KEY"]
         self.model_id = model_id
+        self.encoder = OpenAIEncoder()
+        self.tools = to_openai_tools()
+        self.plan_tools = to_openai_tools(plan=True)
+
+    @cached_property
+    def client(self) -> Any:
+        """SDK client, imported and built on the first request."""
+        import openai
+        return openai.AsyncOpenAI(api_key=self.api_key)
+
+    @cached_property
+    def _encoding(self) -> Any:
+        return _load_encoding(self.model_id)
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return super().count_tokens(text)
+        return len(self._encoding.encode(text, disallowed_special=()))
 
     async def think(self, messages: list[dict[str, Any]], **context: Any) -> Decision:
-        oai_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-        for msg in messages:
-            if msg["role"] == "user":
-                content = msg["content"]
-                if isinstance(content, list):
-                    has_tool_result = any(
-                        isinstance(c, dict) and c.get("type") == "tool_result"
-                        for c in content
-                    )
-                    if has_tool_result:
-                        for c in content:
-                            if isinstance(c, dict) and c.get("type") == "tool_result":
-                                oai_messages.append({
-                                    "role": "tool",
-                                    "tool_call_id": c.get("tool_use_id", ""),
-                                    "content": c.get("content", ""),
-                                })
-                        continue
-                oai_messages.append({"role": "user", "content": content})
-            elif msg["role"] == "assistant":
-                raw_content = msg.get("content", [])
-                text_parts = []
-                tool_calls = []
-                for block in (raw_content if isinstance(raw_content, list) else []):
-                    if isinstance(block, dict):
-                        if block.get("type") == "text":
-                            text_parts.append(block["text"])
-                        elif block.get("type") == "tool_use":
-                            tool_calls.append({
-                                "id": block["id"],
-                                "type": "function",
-                                "function": {
-                                    "name": block["name"],
-                                    "arguments": json.dumps(block["input"]),
-                                },
-                            })
-                oai_msg: dict[str, Any] = {
-                    "role": "assistant",
-                    "content": " ".join(text_parts) if text_parts else None,
-                }
-                if tool_calls:
-                    oai_msg["tool_calls"] = tool_calls
-                oai_messages.append(oai_msg)
+        oai_messages = [{"role": "system", "content": SYSTEM_PROMPT}, *self.encoder.encode(messages)]
+
+        request = {
+            "model": self.model_id,
+            "messages": oai_messages,
+            "tools": self.plan_tools if context.get("plan") else self.tools,
+            "tool_choice": "required",
+        }
+        stream = context.get("stream")
+        if stream is not None:
+            decision = await self._stream(request, stream)
+        else:
+            response = await self.client.chat.completions.create(**request)
+            decision = _parse_tool_call(response)
+            decision.usage = _read_usage(getattr(response, "usage", None))
+        return price_decision(decision, self.model_id)
 
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
         response = await self.client.chat.completions.create(
             model=self.model_id,
-            messages=oai_messages,
-            tools=to_openai_tools(),
-            tool_choice="required",
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+        )
+        text = (response.choices[0].message.content or "") if response.choices else ""
+        decision = Decision(reasoning=text, action_type="", action={}, cost=0.0)
+        decision.usage = _read_usage(getattr(response, "usage", None))
+        return price_decision(decision, self.model_id)
+
+    async def _stream(self, request: dict[str, Any], stream: Any) -> Decision:
+        """Stream the completion, forwarding text deltas and finished tool calls.
+
+        Tool call arguments arrive as JSON fragments keyed by call index. A
+        call is complete once a higher index starts or the stream ends.
+        """
+        text_parts: list[str] = []
+        calls: dict[int, dict[str, Any]] = {}
+        usage = None
+
+        def _emit_finished() -> None:
+            for entry in calls.values():
+                if entry["emitted"]:
+                    continue
+                entry["emitted"] = True
+                try:
+                    arguments = json.loads(entry["arguments"] or "{}")
+                except json.JSONDecodeError:
+                    continue
+                stream.on_tool_call(ToolCall(id=entry["id"], name=entry["name"], input=arguments))
+
+        chunks = await self.client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True},
+        )
+        async for chunk in chunks:
+            # With include_usage, the last chunk has usage and no choices.
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                text_parts.append(delta.content)
+                stream.on_text(delta.content)
+            for fragment in delta.tool_calls or []:
+                if fragment.index not in calls:
+                    _emit_finished()
+                    calls[fragment.index] = {"id": "", "name": "", "arguments": "", "emitted": False}
+                entry = calls[fragment.index]
+                if fragment.id:
+                    entry["id"] = fragment.id
+                if fragment.function is not None:
+                    entry["name"] += fragment.function.name or ""
+                    entry["arguments"] += fragment.function.arguments or ""
+        _emit_finished()
+
+        decision = _decision_from_message(
+            "".join(text_parts) or None,
+            [(e["id"], e["name"], e["arguments"]) for _, e in sorted(calls.items())],
         )
+        decision.usage = _read_usage(usage)
+        return decision
 
-        return _parse_tool_call(response)
+
+class OpenAIEncoder(IncrementalEncoder):
+    """IR messages to Chat Completions messages.
+
+    A tool result becomes its own ``tool`` message, placed before any text
+    from the same user message, so it directly follows the assistant
+    message that made the call.
+    """
+
+    def encode_message(self, message: IRMessage) -> list[dict[str, Any]]:
+        text = " ".join(p.text for p in message.parts if p.kind == "text")
+        if message.role == "assistant":
+            tool_calls = [
+                {
+                    "id": p.call_id,
+                    "type": "function",
+                    "function": {"name": p.name, "arguments": json.dumps(p.input)},
+                }
+                for p in message.parts if p.kind == "tool_call"
+            ]
+            encoded: dict[str, Any] = {"role": "assistant", "content": text or None}
+            if tool_calls:
+                encoded["tool_calls"] = tool_calls
+            return [encoded]
+
+        encoded_messages: list[dict[str, Any]] = [
+            {"role": "tool", "tool_call_id": p.call_id, "content": p.text}
+            for p in message.parts if p.kind == "tool_result"
+        ]
+        if text:
+            encoded_messages.append({"role": "user", "content": text})
+        return encoded_messages
+
+
+def _read_usage(usage: Any) -> dict[str, int]:
+    """Token counts from an OpenAI usage object; cached tokens are split out of the prompt."""
+    if usage is None:
+        return {}
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    return {
+        "input_tokens": prompt - cached,
+        "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cache_read_tokens": cached,
+        "cache_write_tokens": 0,
+    }
+
+
+def _load_encoding(model_id: str) -> Any:
+    """Exact tokenizer when tiktoken is installed, else None (heuristic count)."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_id)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
 
 
 def _parse_tool_call(response: Any) -> Decision:
-    """Extract the function call from OpenAI's response."""
+    """Extract the function calls from OpenAI's response."""
     message = response.choices[0].message
-    reasoning = message.content or ""
+    return _decision_from_message(
+        message.content,
+        [(c.id, c.function.name, c.function.arguments) for c in message.tool_calls or []],
+    )
 
-    tool_use_id = ""
-    if message.tool_calls:
-        call = message.tool_calls[0]
-        tool_name = call.function.name
-        tool_use_id = call.id
+
+def _decision_from_message(content: str | None, raw_calls: list[tuple[str, str, str]]) -> Decision:
+    """Build a Decision from message text and (id, name, JSON arguments) calls."""
+    reasoning = content or ""
+
+    tool_calls: list[ToolCall] = []
+    for call_id, name, arguments in raw_calls:
         try:
-            tool_input = json.loads(call.function.arguments)
+            tool_input = json.loads(arguments)
         except json.JSONDecodeError:
-            tool_input = {"raw": call.function.arguments}
+            tool_input = {"raw": arguments}
+        tool_calls.append(ToolCall(id=call_id, name=name, input=tool_input))
+
+    if tool_calls:
+        primary = tool_calls[0]
     else:
-        tool_name = "finish_reasoning"
-        tool_input = {"reasoning": reasoning}
+        primary = ToolCall(id="", name="finish_reasoning", input={"reasoning": reasoning})
 
-    if tool_name == "finish_reasoning":
-        reasoning = tool_input.get("reasoning", reasoning)
+    if primary.name == "finish_reasoning":
+        reasoning = primary.input.get("reasoning", reasoning)
 
     raw_content: list[dict[str, Any]] = []
     if reasoning:
         raw_content.append({"type": "text", "text": reasoning})
-    if message.tool_calls:
-        call = message.tool_calls[0]
+    for call in tool_calls:
         raw_content.append({
             "type": "tool_use",
             "id": call.id,
-            "name": call.function.name,
-            "input": tool_input,
+            "name": call.name,
+            "input": call.input,
         })
 
     return Decision(
         reasoning=reasoning,
-        action_type=tool_name,
-        action=tool_input,
+        action_type=primary.name,
+        action=primary.input,
         cost=0.01,
-        tool_use_id=tool_use_id,
+        tool_use_id=primary.id,
         raw_assistant_message={"role": "assistant", "content": raw_content},
+        tool_calls=tool_calls,
     )
@@ -0,0 +1,197 @@
+"""Tool result compaction with a local content-addressed blob store.
+
+A large tool result is not pasted into the history. It goes into a blob
+store, keyed by the SHA-256 of its JSON. The model instead sees a
+structure-aware summary that fits the tool's token budget. The summary
+keeps scalar fields such as status and error, counts and samples long
+lists, and keeps the head and tail of long text. It is always valid JSON
+and carries a ``_ref`` that the model can pass to the ``fetch_result``
+tool to read any part of the original.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Token budget for one tool result as the model sees it.
+RESULT_BUDGETS: dict[str, int] = {
+    "browser_task": 1200,
+    "send_email": 200,
+    "send_usdc": 200,
+    "send_usdc_email": 200,
+    "finish_reasoning": 150,
+    "fetch_result": 2000,
+    "submit_plan": 2500,
+}
+DEFAULT_BUDGET = 300
+
+# Fields shown first in a summary, so a tight budget never drops them.
+KEY_FIELDS = ("status", "error", "message", "task_id", "session_status")
+
+# Successively tighter (string chars, list items) limits tried when summarizing.
+_SHRINK_STEPS = ((2000, 20), (800, 10), (300, 5), (120, 3), (40, 2))
+_MAX_DEPTH = 4
+
+
+def _head_tail(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    head = limit * 2 // 3
+    tail = limit - head
+    return f"{text[:head]} …[{len(text) - limit} chars omitted]… {text[-tail:]}"
+
+
+def _shrink(value: Any, chars: int, items: int, depth: int = 0) -> Any:
+    if isinstance(value, str):
+        return _head_tail(value, chars)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if depth >= _MAX_DEPTH:
+        return _head_tail(json.dumps(value, default=str), chars)
+    if isinstance(value, dict):
+        keys = [k for k in KEY_FIELDS if k in value] + [k for k in value if k not in KEY_FIELDS]
+        kept = {str(k): _shrink(value[k], chars, items, depth + 1) for k in keys[:items * 2]}
+        if len(keys) > items * 2:
+            kept["_omitted_keys"] = len(keys) - items * 2
+        return kept
+    if isinstance(value, (list, tuple)):
+        if len(value) <= items:
+            return [_shrink(v, chars, items, depth + 1) for v in value]
+        # Keep the first and last items and say how many were skipped.
+        head = [_shrink(v, chars, items, depth + 1) for v in value[:items - 1]]
+        return head + [f"…{len(value) - items} more items…", _shrink(value[-1], chars, items, depth + 1)]
+    return _head_tail(str(value), chars)
+
+
+def summarize(value: Any, max_chars: int) -> Any:
+    """A JSON-serializable version of ``value`` whose JSON fits in ``max_chars``."""
+    shrunk = value
+    for chars, items in _SHRINK_STEPS:
+        shrunk = _shrink(value, chars, items)
+        if len(json.dumps(shrunk, default=str)) <= max_chars:
+            return shrunk
+    return _head_tail(json.dumps(shrunk, default=str), max(max_chars - 40, 40))
+
+
+def _fitting_length(text: str, max_encoded: int) -> int:
+    """Longest prefix of ``text`` whose JSON string literal adds at most ``max_encoded`` chars."""
+    # Empty content already encodes as '""', counted in the envelope.
+    low, high = 0, min(len(text), max(max_encoded, 0))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if len(json.dumps(text[:middle])) - 2 <= max_encoded:
+            low = middle
+        else:
+            high = middle - 1
+    # Always make progress, even with a budget too small for one escaped char.
+    return max(low, min(len(text), 1))
+
+
+class ResultStore:
+    """Full tool results on local disk, keyed by content hash."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.root, ref[:2], f"{ref}.json")
+
+    def put(self, text: str) -> str:
+        """Store ``text`` (a JSON document) and return its ref. Idempotent."""
+        ref = hashlib.sha256(text.encode()).hexdigest()[:16]
+        path = self._path(ref)
+        if os.path.exists(path):
+            return ref
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to store result %s: %s", ref, e)
+        return ref
+
+    def get(self, ref: str) -> Any:
+        """The stored result, or None if ``ref`` is unknown."""
+        if not ref.isalnum():
+            return None
+        try:
+            with open(self._path(ref)) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def fetch(self, arguments: dict[str, Any], max_chars: int = 6000) -> dict[str, Any]:
+        """Execute a ``fetch_result`` call: a slice of one stored result (or field of it).
+
+        The page is sized so the whole response, JSON-encoded, fits in
+        ``max_chars``. Escaping can make a slice much longer than its
+        character count, and an oversized page would be compacted again,
+        silently skipping the text between it and ``next_offset``.
+        """
+        ref = str(arguments.get("ref", "")).removeprefix("r:")
+        value = self.get(ref)
+        if value is None:
+            return {"status": "error", "error": f"No stored result with ref '{ref}'"}
+        field = str(arguments.get("field") or "")
+        for part in filter(None, field.split(".")):
+            if isinstance(value, dict) and part in value:
+                value = value[part]
+            elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+                value = value[int(part)]
+            else:
+                return {"status": "error", "error": f"Result {ref} has no field '{field}'"}
+        text = value if isinstance(value, str) else json.dumps(value, default=str, indent=1)
+        offset = max(int(arguments.get("offset") or 0), 0)
+        page = {
+            "status": "success",
+            "ref": ref,
+            "field": field,
+            "offset": offset,
+            "total_chars": len(text),
+            "content": "",
+            "next_offset": None,
+        }
+        # Leave room for next_offset to become a number instead of null.
+        envelope = len(json.dumps(page)) + len(str(len(text)))
+        end = offset + _fitting_length(text[offset:], max_chars - envelope)
+        page["content"] = text[offset:end]
+        page["next_offset"] = end if end < len(text) else None
+        return page
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class ResultCompactor:
+    """Turns raw tool results into what the model and history keep."""
+
+    def __init__(self, store: ResultStore, chars_per_token: float = 4.0):
+        self.store = store
+        self.chars_per_token = chars_per_token
+
+    def budget_chars(self, action_type: str) -> int:
+        return int(RESULT_BUDGETS.get(action_type, DEFAULT_BUDGET) * self.chars_per_token)
+
+    def compact(self, action_type: str, result: Any) -> Any:
+        """``result`` unchanged if it fits the tool's budget, else a summary with a ``_ref``."""
+        text = json.dumps(result, default=str)
+        max_chars = self.budget_chars(action_type)
+        if len(text) <= max_chars:
+            return result
+        ref = self.store.put(text)
+        # Leave room for the ref fields added below.
+        summary = summarize(result, max_chars - 60)
+        if isinstance(summary, dict):
+            return {**summary, "_ref": f"r:{ref}", "_truncated": len(text)}
+        return {"summary": summary, "_ref": f"r:{ref}", "_truncated": len(text)}
+
+    def fetch(self, arguments: dict[str, Any]) -> dict[str, Any]:
+        """Execute a ``fetch_result`` call with pages that fit its own result budget."""
+        return self.store.fetch(arguments, max_chars=self.budget_chars("fetch_result"))
@@ -0,0 +1,74 @@
+"""Streaming think support — partial reasoning events and early tool dispatch.
+
+Providers that stream call ``on_text`` for each text delta and
+``on_tool_call`` as soon as a tool call's arguments are complete.
+``ReasoningStream`` turns those callbacks into throttled ``thinking``
+events for spectators. It also starts eligible tool calls before the rest
+of the response has arrived.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from base import ToolCall
+
+logger = logging.getLogger(__name__)
+
+
+class ReasoningStream:
+    """Collects one think call's streamed output."""
+
+    def __init__(
+        self,
+        publish: Callable[[str], Awaitable[None]],
+        dispatch: Callable[[ToolCall], asyncio.Task | None] | None = None,
+        interval: float = 0.3,
+    ):
+        self.publish = publish
+        self.dispatch = dispatch
+        self.interval = interval
+        self.text = ""
+        self.dispatched: dict[str, asyncio.Task] = {}
+        self._last_publish = 0.0
+        self._publish_task: asyncio.Task | None = None
+
+    def on_text(self, delta: str) -> None:
+        self.text += delta
+        now = time.monotonic()
+        if now - self._last_publish < self.interval:
+            return
+        if self._publish_task is not None and not self._publish_task.done():
+            return
+        self._last_publish = now
+        self._publish_task = asyncio.create_task(self._publish(self.text))
+
+    def on_tool_call(self, call: ToolCall) -> None:
+        if self.dispatch is None or not call.id or call.id in self.dispatched:
+            return
+        task = self.dispatch(call)
+        if task is not None:
+            logger.info("Early-dispatched %s before the response finished", call.name)
+            self.dispatched[call.id] = task
+
+    def reset(self) -> None:
+        """Discard output from a provider attempt that failed mid-stream."""
+        self.text = ""
+        self.cancel_unclaimed(set())
+
+    def take(self, call_id: str) -> asyncio.Task | None:
+        """Claim the early-dispatched task for ``call_id``, if any."""
+        return self.dispatched.pop(call_id, None)
+
+    def cancel_unclaimed(self, keep_ids: set[str]) -> None:
+        """Cancel dispatched calls that are not in the final decision."""
+        for call_id in list(self.dispatched):
+            if call_id not in keep_ids:
+                self.dispatched.pop(call_id).cancel()
+
+    async def _publish(self, text: str) -> None:
+        try:
+            await self.publish(text)
+        except Exception as e:
+            logger.debug("Partial reasoning publish failed: %s", e)
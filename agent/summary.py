@@ -0,0 +1,129 @@
+"""Rolling episode summary of the turns the history trimmer evicts.
+
+Without a summary, a trim throws away everything the agent learned in the
+dropped turns, and the model often spends steps rediscovering it. Now
+the trimmer hands the dropped turns to ``EpisodeSummarizer.evict``. That
+starts a background call to a cheap model, which folds them into one
+running summary, off the step's critical path. Updates are applied in
+eviction order.
+
+``apply`` keeps the latest summary as a user message right after
+``messages[0]``, in the history's fixed head. The trimmer never drops
+the head. The summary message only changes when the summary does, so
+provider prompt caches and the incremental encoders keep hitting.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any
+
+from base import BaseProvider
+from history import SUMMARY_HEADER, head_length
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """\
+You keep the running memory of an autonomous agent working toward a goal. \
+Older steps are being removed from its context window. Merge them into the \
+existing summary.
+
+Keep what the agent will need later: facts it discovered (accounts, URLs, \
+addresses, prices, contacts), what it already tried and how that went, \
+commitments it made, money it sent, and open leads. Drop routine detail. \
+Write plain text, at most {max_words} words.
+
+EXISTING SUMMARY:
+{summary}
+
+STEPS BEING REMOVED:
+{steps}
+
+UPDATED SUMMARY:"""
+
+
+def render_turns(turns: list[list[dict[str, Any]]], result_chars: int = 600) -> str:
+    """Compact text of evicted turns: the agent's reasoning, calls and results.
+
+    The per-step user prompts restate the goal and live state, so they are left out.
+    """
+    lines: list[str] = []
+    for turn in turns:
+        for message in turn:
+            content = message.get("content")
+            if not isinstance(content, list):
+                continue
+            for block in content:
+                if not isinstance(block, dict):
+                    continue
+                if block.get("type") == "text" and message.get("role") == "assistant":
+                    lines.append(f"- thought: {block.get('text', '')[:result_chars]}")
+                elif block.get("type") == "tool_use":
+                    lines.append(f"- called {block.get('name')}: {json.dumps(block.get('input'), default=str)[:result_chars]}")
+                elif block.get("type") == "tool_result":
+                    lines.append(f"  result: {str(block.get('content', ''))[:result_chars]}")
+    return "\n".join(lines)
+
+
+class EpisodeSummarizer:
+    """Maintains one sandbox's rolling summary using ``provider``."""
+
+    def __init__(self, provider: BaseProvider, max_words: int = 400, max_chars: int = 4000):
+        self.provider = provider
+        self.max_words = max_words
+        self.max_chars = max_chars
+        self.summary = ""
+        self.pending_cost = 0.0
+        self._message: dict[str, Any] | None = None
+        self._task: asyncio.Task | None = None
+
+    def restore(self, messages: list[dict[str, Any]]) -> None:
+        """Pick up the summary from a restored history."""
+        if head_length(messages) == 2:
+            self._message = messages[1]
+            self.summary = messages[1]["content"][len(SUMMARY_HEADER):]
+
+    def evict(self, turns: list[list[dict[str, Any]]]) -> None:
+        """Trimmer callback: fold ``turns`` into the summary in the background."""
+        steps = render_turns(turns)
+        if steps:
+            self._task = asyncio.create_task(self._update(self._task, steps))
+
+    async def _update(self, previous: asyncio.Task | None, steps: str) -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.max_words, summary=self.summary or "(none yet)", steps=steps,
+        )
+        try:
+            decision = await self.provider.complete(prompt, max_tokens=self.max_words * 2)
+        except Exception as e:
+            logger.warning("Episode summary update failed: %s", e)
+            return
+        self.pending_cost += decision.cost
+        text = decision.reasoning.strip()[:self.max_chars]
+        if text:
+            self.summary = text
+            logger.info("Episode summary updated (%d chars)", len(text))
+
+    def apply(self, messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """``messages`` with the current summary in the head, if there is one."""
+        if not self.summary or not messages:
+            return messages
+        content = SUMMARY_HEADER + self.summary
+        if self._message is None or self._message["content"] != content:
+            self._message = {"role": "user", "content": content}
+        if head_length(messages) == 2:
+            if messages[1] is self._message:
+                return messages
+            return [messages[0], self._message] + messages[2:]
+        return [messages[0], self._message] + messages[1:]
+
+    def take_cost(self) -> float:
+        """USD spent on summary updates since the last call."""
+        cost, self.pending_cost = self.pending_cost, 0.0
+        return cost
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
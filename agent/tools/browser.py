@@ -3,23 +3,32 @@
 Uses Browser Use's v3 BU Agent API: give it a natural language task
 and it handles all browser actions autonomously. Sessions provide a live_url
 for real-time browser monitoring.
+
+The SDK is imported when the first client is built. A session can be
+started in the background with ``start_session`` while the agent does other
+startup work; ``ensure_session`` waits for it. A restarted agent passes its
+old session id to reattach instead of paying for a new session.
 """
 
+import asyncio
 import os
 import logging
 from typing import Any
 
-from browser_use_sdk.v3 import AsyncBrowserUse, BrowserUseError
-
 logger = logging.getLogger(__name__)
 
 
 class BrowserTool:
-    def __init__(self, api_key: str | None = None):
+    def __init__(self, api_key: str | None = None, client: Any = None):
         self.api_key = api_key or os.environ.get("BROWSER_USE_API_KEY", "")
-        self.client = AsyncBrowserUse(api_key=self.api_key)
+        self._owns_client = client is None
+        if client is None:
+            from browser_use_sdk.v3 import AsyncBrowserUse
+            client = AsyncBrowserUse(api_key=self.api_key)
+        self.client = client
         self.session_id: str | None = None
         self.live_url: str | None = None
+        self._session_task: asyncio.Task | None = None
 
     async def create_session(self) -> None:
         """Create an idle Browser Use cloud session for reuse across tasks."""
@@ -31,6 +40,43 @@ class BrowserTool:
             self.session_id, self.live_url,
         )
 
+    async def attach_session(self, session_id: str) -> bool:
+        """Reattach to an existing session (e.g. after a restart). False if it's gone."""
+        try:
+            session = await self.client.sessions.get(session_id)
+        except Exception as e:
+            logger.info("Browser session %s not reattachable: %s", session_id, e)
+            return False
+        status = str(getattr(session, "status", "")).lower()
+        if any(word in status for word in ("stopped", "closed", "error", "expired")):
+            logger.info("Browser session %s is %s — not reattaching", session_id, status)
+            return False
+        self.session_id = session_id
+        self.live_url = getattr(session, "live_url", None)
+        logger.info("Reattached to browser session %s", session_id)
+        return True
+
+    def start_session(self, resume_id: str | None = None) -> asyncio.Task:
+        """Begin creating (or reattaching to ``resume_id``) the session in the background."""
+        if self._session_task is None:
+            self._session_task = asyncio.create_task(self._open_session(resume_id))
+        return self._session_task
+
+    async def _open_session(self, resume_id: str | None) -> None:
+        if resume_id and await self.attach_session(resume_id):
+            return
+        await self.create_session()
+
+    async def ensure_session(self) -> None:
+        """Wait for a background session, or create one if none was started."""
+        if self._session_task is not None:
+            try:
+                await asyncio.shield(self._session_task)
+            except Exception as e:
+                logger.warning("Background session creation failed: %s", e)
+        if not self.session_id:
+            await self.create_session()
+
     async def execute(self, action: dict[str, Any]) -> dict[str, Any]:
         """Execute a high-level browser task via natural language.
 
@@ -43,10 +89,10 @@ class BrowserTool:
         if not task:
             return {"status": "error", "error": "No task description provided"}
 
-        if not self.session_id:
-            await self.create_session()
+        from browser_use_sdk.v3 import BrowserUseError
 
         try:
+            await self.ensure_session()
             result = await self.client.run(
                 task,
                 session_id=self.session_id,
@@ -93,15 +139,23 @@ class BrowserTool:
 
     async def close(self) -> None:
         """Stop the Browser Use session and release the client."""
+        if self._session_task is not None:
+            # Let an in-flight create finish so its session can be stopped.
+            try:
+                await self._session_task
+            except Exception as e:
+                logger.debug("Background session creation did not finish: %s", e)
+            self._session_task = None
         if self.session_id:
             try:
                 await self.client.sessions.stop(self.session_id)
             except Exception as e:
                 logger.debug("Error stopping session: %s", e)
-        try:
-            await self.client.close()
-        except Exception:
-            pass
+        if self._owns_client:
+            try:
+                await self.client.close()
+            except Exception:
+                pass
         self.session_id = None
         self.live_url = None
         logger.info("Browser session closed")
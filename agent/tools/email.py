@@ -5,16 +5,22 @@ import os
 import logging
 from typing import Any
 
-from agentmail import AsyncAgentMail
-
 logger = logging.getLogger(__name__)
 
 
 class EmailTool:
-    def __init__(self, api_key: str | None = None, inbox_id: str = ""):
+    def __init__(
+        self,
+        api_key: str | None = None,
+        inbox_id: str = "",
+        client: Any = None,
+    ):
         self.api_key = api_key or os.environ.get("AGENTMAIL_API_KEY", "")
         self.inbox_id = inbox_id
-        self.client = AsyncAgentMail(api_key=self.api_key)
+        if client is None:
+            from agentmail import AsyncAgentMail
+            client = AsyncAgentMail(api_key=self.api_key)
+        self.client = client
 
     async def check_inbox(self) -> list[dict[str, Any]]:
         """Fetch recent messages from the agent's inbox."""
@@ -21,18 +21,26 @@ logger = logging.getLogger(__name__)
 LOCUS_API_BASE = "https://api.paywithlocus.com/api"
 
 
+def make_locus_client(api_key: str) -> httpx.AsyncClient:
+    """Build an authenticated Locus client (shareable across PaymentsTools)."""
+    return httpx.AsyncClient(
+        base_url=LOCUS_API_BASE,
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        },
+        timeout=30.0,
+    )
+
+
 class PaymentsTool:
-    def __init__(self, api_key: str | None = None):
+    def __init__(self, api_key: str | None = None, client: httpx.AsyncClient | None = None):
         self.api_key = api_key or os.environ.get("LOCUS_API_KEY", "")
         self._available = bool(self.api_key)
-        self.client = httpx.AsyncClient(
-            base_url=LOCUS_API_BASE,
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-            timeout=30.0,
-        ) if self._available else None
+        self._owns_client = client is None
+        if client is None and self._available:
+            client = make_locus_client(self.api_key)
+        self.client = client if self._available else None
         self._cached_balance: float = 0.0
 
     async def get_balance(self) -> float:
@@ -173,5 +181,5 @@ class PaymentsTool:
             return []
 
     async def close(self) -> None:
-        if self.client:
+        if self.client and self._owns_client:
             await self.client.aclose()
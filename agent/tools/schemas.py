@@ -97,6 +97,32 @@ TOOL_SCHEMAS: list[dict[str, Any]] = [
             "required": ["email", "amount", "memo"],
         },
     },
+    {
+        "name": "fetch_result",
+        "description": (
+            "Read more of an earlier tool result that was summarized. Pass the "
+            "result's _ref, optionally a field path (e.g. 'output' or 'steps.2') "
+            "and an offset to page through long text."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "ref": {
+                    "type": "string",
+                    "description": "The _ref of the summarized result (e.g. 'r:3f9a1c0b2d4e5f60')",
+                },
+                "field": {
+                    "type": "string",
+                    "description": "Dot-separated path into the result; omit for the whole result",
+                },
+                "offset": {
+                    "type": "integer",
+                    "description": "Character offset to start reading from (use next_offset to continue)",
+                },
+            },
+            "required": ["ref"],
+        },
+    },
     {
         "name": "finish_reasoning",
         "description": (
@@ -120,8 +146,92 @@ TOOL_SCHEMAS: list[dict[str, Any]] = [
     },
 ]
 
+# Tools a submit_plan step may call.
+PLANNABLE_TOOLS = frozenset({"browser_task", "send_email", "send_usdc", "send_usdc_email", "fetch_result"})
+
+# Offered only to sandboxes with plan mode on (see planning.py).
+PLAN_TOOL_SCHEMA: dict[str, Any] = {
+    "name": "submit_plan",
+    "description": (
+        "Plan a routine sequence of actions in one go. The steps run back-to-back "
+        "without consulting you; you are asked again when a step's guard fails, a "
+        "step errors, a user prompt arrives, or the plan ends. Use it for predictable "
+        "stretches (e.g. open a site, post, check replies), not for uncertain ones."
+    ),
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "description": "Ordered tool calls to run",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "tool": {
+                            "type": "string",
+                            "enum": sorted(PLANNABLE_TOOLS),
+                            "description": "Tool to call",
+                        },
+                        "arguments": {
+                            "type": "string",
+                            "description": "The tool's arguments as a JSON object string",
+                        },
+                        "guard": {
+                            "type": "string",
+                            "description": (
+                                "Condition on the previous step's result: 'previous_ok' (default), "
+                                "'always', 'previous_contains:TEXT' or 'previous_lacks:TEXT'"
+                            ),
+                        },
+                    },
+                    "required": ["tool", "arguments"],
+                },
+            },
+        },
+        "required": ["steps"],
+    },
+}
+
+_SCHEMAS_BY_NAME = {schema["name"]: schema for schema in TOOL_SCHEMAS + [PLAN_TOOL_SCHEMA]}
+_JSON_TYPES: dict[str, tuple[type, ...]] = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+}
+
+
+def validate_tool_call(name: str, arguments: Any) -> str | None:
+    """Why a tool call doesn't match its schema, or None if it does.
+
+    Gemini sends every number as a float, so whole-number floats pass as
+    integers and are converted to int in ``arguments``.
+    """
+    schema = _SCHEMAS_BY_NAME.get(name)
+    if schema is None:
+        return f"unknown tool '{name}'"
+    if not isinstance(arguments, dict):
+        return f"{name} arguments are not an object"
+    params = schema["parameters"]
+    for field in params.get("required", []):
+        if arguments.get(field) in (None, ""):
+            return f"{name} is missing '{field}'"
+    for field, value in arguments.items():
+        expected = _JSON_TYPES.get(params["properties"].get(field, {}).get("type", ""))
+        if expected is None or value is None:
+            continue
+        if expected == (int,) and isinstance(value, float) and value.is_integer():
+            arguments[field] = value = int(value)
+        if not isinstance(value, expected) or (bool not in expected and isinstance(value, bool)):
+            return f"{name}.{field} should be a {params['properties'][field]['type']}"
+    return None
+
+
+def _schemas(plan: bool) -> list[dict[str, Any]]:
+    return TOOL_SCHEMAS + [PLAN_TOOL_SCHEMA] if plan else TOOL_SCHEMAS
+
 
-def to_anthropic_tools() -> list[dict[str, Any]]:
+def to_anthropic_tools(plan: bool = False) -> list[dict[str, Any]]:
     """Convert to Anthropic tool format for messages.create(tools=...)."""
     return [
         {
@@ -129,11 +239,11 @@ def to_anthropic_tools() -> list[dict[str, Any]]:
             "description": schema["description"],
             "input_schema": schema["parameters"],
         }
-        for schema in TOOL_SCHEMAS
+        for schema in _schemas(plan)
     ]
 
 
-def to_openai_tools() -> list[dict[str, Any]]:
+def to_openai_tools(plan: bool = False) -> list[dict[str, Any]]:
     """Convert to OpenAI tool format for chat.completions.create(tools=...)."""
     return [
         {
@@ -144,11 +254,11 @@ def to_openai_tools() -> list[dict[str, Any]]:
                 "parameters": schema["parameters"],
             },
         }
-        for schema in TOOL_SCHEMAS
+        for schema in _schemas(plan)
     ]
 
 
-def to_gemini_tools() -> list[Any]:
+def to_gemini_tools(plan: bool = False) -> list[Any]:
     """Convert to Gemini tool format for generate_content(tools=...)."""
     try:
         from google.generativeai.types import FunctionDeclaration, Tool
@@ -156,7 +266,7 @@ def to_gemini_tools() -> list[Any]:
         return []
 
     declarations = []
-    for schema in TOOL_SCHEMAS:
+    for schema in _schemas(plan):
         declarations.append(
             FunctionDeclaration(
                 name=schema["name"],
@@ -0,0 +1,58 @@
+"""Lazy Laminar tracing.
+
+``lmnr`` is slow to import, and importing it at module load delays every
+agent's first step. ``observe`` here is a drop-in decorator that resolves
+``lmnr.observe`` on the first traced call after ``init_tracing`` has run.
+Calls made before that (or with tracing off) run untraced.
+"""
+
+import functools
+import logging
+import os
+from typing import Any, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+_initialized = False
+
+
+def init_tracing() -> bool:
+    """Initialize Laminar if ``LMNR_PROJECT_API_KEY`` is set. Safe to call twice.
+
+    Blocking — run it in a thread to overlap it with other startup work.
+    """
+    global _initialized
+    if _initialized or not os.environ.get("LMNR_PROJECT_API_KEY"):
+        return _initialized
+    try:
+        from lmnr import Laminar
+        Laminar.initialize()
+    except Exception as e:
+        logger.warning("Laminar tracing unavailable: %s", e)
+        return False
+    _initialized = True
+    logger.info("Laminar tracing initialized")
+    return True
+
+
+def observe(name: str) -> Callable[[F], F]:
+    """Like ``lmnr.observe(name=...)`` for async functions, bound on first use."""
+
+    def decorator(fn: F) -> F:
+        traced: Callable[..., Awaitable[Any]] | None = None
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            nonlocal traced
+            if not _initialized:
+                return await fn(*args, **kwargs)
+            if traced is None:
+                from lmnr import observe as lmnr_observe
+                traced = lmnr_observe(name=name)(fn)
+            return await traced(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
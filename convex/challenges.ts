@@ -28,6 +28,7 @@ export const create = mutation({
       createdAt: now,
       expiresAt: now + args.timeLimit * 1000,
       createdBy: args.userId,
+      headToHead: true,
     };
 
     const claudeSandboxId = await ctx.db.insert("sandboxes", {
@@ -17,6 +17,37 @@ export const push = mutation({
   },
 });
 
+export const pushBatch = mutation({
+  args: {
+    events: v.array(
+      v.object({
+        sandboxId: v.id("sandboxes"),
+        eventType: v.string(),
+        payload: v.string(),
+        timestamp: v.number(),
+      }),
+    ),
+    progress: v.optional(
+      v.array(
+        v.object({
+          sandboxId: v.id("sandboxes"),
+          progress: v.number(),
+        }),
+      ),
+    ),
+  },
+  handler: async (ctx, args) => {
+    for (const event of args.events) {
+      await ctx.db.insert("agentEvents", event);
+    }
+    for (const update of args.progress ?? []) {
+      await ctx.db.patch(update.sandboxId, {
+        currentProgress: update.progress,
+      });
+    }
+  },
+});
+
 export const recent = query({
   args: {
     sandboxId: v.id("sandboxes"),
@@ -41,6 +41,8 @@ export default defineSchema({
     accountHandle: v.optional(v.string()),
     /** Agent earnings in USD (tracked when agent completes paid tasks / settles). */
     agentEarningsUsd: v.optional(v.number()),
+    /** True for the paired sandboxes of a challenge; the agent must think only on `model`. */
+    headToHead: v.optional(v.boolean()),
     createdAt: v.number(),
     expiresAt: v.number(),
     createdBy: v.id("users"),
@@ -0,0 +1,444 @@
+"""Offline agent-loop benchmark — drives run_agent against in-process mocks.
+
+Providers, tools and the EventBridge are replaced by mocks with
+configurable log-normal latencies, so the numbers measure the loop itself:
+scheduling, prompt building, history trimming, checkpointing and event
+plumbing. No network or API keys are needed, so it can run in CI on every
+change.
+
+Reports steps/sec, framework overhead per step (step time minus the mock
+latency on the critical path), peak RSS and event counts, in windows as the
+message history grows.
+
+Usage:
+    python eval/loop_benchmark.py                         # zero-latency overhead run
+    python eval/loop_benchmark.py --scenario realistic --time-scale 0.01
+    python eval/loop_benchmark.py --steps 500 --json bench.json --max-overhead-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any
+
+AGENT_DIR = os.path.join(os.path.dirname(__file__), "..", "agent")
+sys.path.insert(0, AGENT_DIR)
+
+import agent_runner  # noqa: E402
+from base import BaseProvider, Decision, ToolCall  # noqa: E402
+from goal_verifier import GoalVerifier  # noqa: E402
+from hedging import HedgePolicy  # noqa: E402
+from memory import AgentMemory  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+from tools.browser import BrowserTool  # noqa: E402
+from tools.email import EmailTool  # noqa: E402
+from tools.payments import PaymentsTool  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Median latency (seconds) per mock call, before --time-scale.
+SCENARIOS: dict[str, dict[str, float]] = {
+    "overhead": {"think": 0.0, "browser": 0.0, "email": 0.0, "payments": 0.0, "memory": 0.0, "bridge": 0.0},
+    "realistic": {"think": 1.5, "browser": 8.0, "email": 0.4, "payments": 0.3, "memory": 0.2, "bridge": 0.05},
+}
+
+
+class Latency:
+    """Log-normal latency with the given median; zero median means no wait."""
+
+    def __init__(self, median: float, sigma: float = 0.4, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+        self.total = 0.0
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.rng.gauss(0.0, self.sigma))
+
+    async def wait(self) -> float:
+        seconds = self.sample()
+        self.total += seconds
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        return seconds
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class MockProvider(BaseProvider):
+    """Emits a seeded mix of tool calls and samples how the history grows."""
+
+    def __init__(self, latency: Latency, seed: int = 0, multi_call_rate: float = 0.15):
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.multi_call_rate = multi_call_rate
+        self.calls = 0
+        self.samples: list[dict[str, Any]] = []
+        self.bridge: MockBridge | None = None
+
+    async def think(self, messages: list[dict[str, Any]], **context: Any) -> Decision:
+        self.calls += 1
+        self.samples.append({
+            # The loop's step, not this provider's call count: under the
+            # cascade one step can think on two providers.
+            "step": self.bridge.events["cost"] + 1 if self.bridge is not None else self.calls,
+            "time": time.perf_counter(),
+            "messages": len(messages),
+            "history_chars": sum(len(str(m.get("content", ""))) for m in messages),
+            "rss_mb": _rss_mb(),
+            "events": sum(self.bridge.events.values()) if self.bridge is not None else 0,
+        })
+        await self.latency.wait()
+
+        calls = [self._call(0)]
+        if self.rng.random() < self.multi_call_rate:
+            calls.append(self._call(1, name="send_email"))
+        reasoning = f"Step {self.calls}: " + " ".join(["continuing toward the goal"] * 8)
+        stream = context.get("stream")
+        if stream is not None:
+            stream.on_text(reasoning)
+            for call in calls:
+                stream.on_tool_call(call)
+        return Decision(
+            reasoning=reasoning,
+            action_type=calls[0].name,
+            action=calls[0].input,
+            cost=1.0,
+            tool_use_id=calls[0].id,
+            raw_assistant_message={"role": "assistant", "content": [{"type": "text", "text": reasoning}] + [
+                {"type": "tool_use", "id": c.id, "name": c.name, "input": c.input} for c in calls
+            ]},
+            tool_calls=calls,
+            usage={"input_tokens": 2000, "output_tokens": 150},
+        )
+
+    async def complete(self, prompt: str, max_tokens: int = 1024) -> Decision:
+        """History summaries; kept out of ``calls`` and ``samples``, which track think."""
+        await self.latency.wait()
+        return Decision(
+            reasoning=f"Summary of {prompt.count('- called ')} more steps: followers growing, no open leads.",
+            action_type="",
+            action={},
+            cost=0.0,
+            usage={"input_tokens": len(prompt) // 4, "output_tokens": 60},
+        )
+
+    def _call(self, index: int, name: str | None = None) -> ToolCall:
+        if name is None:
+            name = self.rng.choices(["browser_task", "send_email", "send_usdc"], weights=[8, 2, 1])[0]
+        n = self.calls
+        inputs = {
+            "browser_task": {"task": f"Open site {n % 37} and check item {self.rng.randint(0, 10_000)}"},
+            "send_email": {"to": f"lead{n}@example.com", "subject": f"Hello {n}", "body": "Quick question " * 20},
+            "send_usdc": {"to_address": "0x" + "ab" * 20, "amount": 0.01, "memo": f"tip {n}"},
+        }
+        return ToolCall(id=f"call_{n}_{index}", name=name, input=inputs[name])
+
+
+class MockBrowser(BrowserTool):
+    def __init__(self, latency: Latency):
+        super().__init__(client=object())
+        self.latency = latency
+
+    async def create_session(self) -> None:
+        await self.latency.wait()
+        self.session_id = "mock-session"
+        self.live_url = "https://live.example/mock-session"
+
+    async def attach_session(self, session_id: str) -> bool:
+        return False
+
+    async def execute(self, action: dict[str, Any]) -> dict[str, Any]:
+        await self.latency.wait()
+        return {"status": "completed", "output": "Page text " * 80, "task_id": "t", "cost_usd": "0"}
+
+    async def get_session_details(self) -> dict[str, Any]:
+        return {"session_id": self.session_id, "live_url": self.live_url}
+
+    async def close(self) -> None:
+        self.session_id = None
+
+
+class MockEmail(EmailTool):
+    def __init__(self, latency: Latency):
+        super().__init__(client=object())
+        self.latency = latency
+
+    async def check_inbox(self) -> list[dict[str, Any]]:
+        await self.latency.wait()
+        return []
+
+    async def send(self, action: dict[str, Any]) -> dict[str, Any]:
+        await self.latency.wait()
+        return {"status": "sent", "message_id": "m"}
+
+    async def count_positive_replies(self) -> int:
+        return 0
+
+
+class MockPayments(PaymentsTool):
+    def __init__(self, latency: Latency):
+        super().__init__(api_key="mock", client=object())
+        self.latency = latency
+
+    async def get_balance(self) -> float:
+        await self.latency.wait()
+        return 100.0
+
+    async def send_usdc(self, action: dict[str, Any]) -> dict[str, Any]:
+        await self.latency.wait()
+        return {"status": "success", "tx_hash": "0x0"}
+
+    async def send_usdc_email(self, action: dict[str, Any]) -> dict[str, Any]:
+        await self.latency.wait()
+        return {"status": "success"}
+
+    async def get_transaction_history(self, limit: int = 50) -> list[dict[str, Any]]:
+        return []
+
+    async def close(self) -> None:
+        return None
+
+
+class MockMemory(AgentMemory):
+    """Keeps AgentMemory's write-behind queue and search cache; mocks the client calls."""
+
+    def __init__(self, latency: Latency):
+        super().__init__(client=object())
+        self.latency = latency
+
+    def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        seconds = self.latency.sample()
+        self.latency.total += seconds
+        time.sleep(seconds)
+
+    async def _refresh(self, key: tuple[str, str, int]) -> list[dict[str, Any]]:
+        try:
+            await self.latency.wait()
+            memories = [{"content": "Past learning " * 10, "similarity": 0.8}]
+            self._search_cache[key] = (time.monotonic(), self._landed.get(key[0], 0), memories)
+            return memories
+        finally:
+            self._refreshing.pop(key, None)
+
+
+class MockBridge:
+    """EventBridge stand-in that counts what the loop pushes."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.events: Counter[str] = Counter()
+        self.calls: Counter[str] = Counter()
+        self.phases: dict[str, Any] = {}
+
+    async def push_event(self, sandbox_id: str, event_type: str, payload: dict[str, Any]) -> None:
+        self.events[event_type] += 1
+        if event_type == "metrics":
+            self.phases = payload
+        await self.latency.wait()
+
+    async def update_progress(self, sandbox_id: str, progress: float) -> None:
+        self.calls["update_progress"] += 1
+        await self.latency.wait()
+
+    async def update_live_url(self, sandbox_id: str, live_url: str, share_url: str = "") -> None:
+        self.calls["update_live_url"] += 1
+
+    async def fetch_pending_prompts(self, sandbox_id: str) -> list[dict[str, Any]]:
+        self.calls["fetch_pending_prompts"] += 1
+        await self.latency.wait()
+        return []
+
+    async def acknowledge_prompt(self, prompt_id: str) -> None:
+        self.calls["acknowledge_prompt"] += 1
+
+    async def complete_sandbox(self, sandbox_id: str, outcome: str) -> None:
+        self.calls["complete_sandbox"] += 1
+
+
+class BenchResources:
+    """``shared`` for run_agent: a router of mock providers plus mock tools."""
+
+    def __init__(self, latencies: dict[str, Latency], seed: int = 0):
+        self.latencies = latencies
+        self.router = ModelRouter()
+        # One instance per key: register() sets each one's context window.
+        for key in self.router.PROVIDER_MODULES:
+            self.router.register(key, MockProvider(latencies["think"], seed=seed))
+        self.hedge = HedgePolicy(max_in_flight=1)
+        self.http = object()
+
+    def build_tools(self, sandbox_config: dict) -> tuple:
+        browser = MockBrowser(self.latencies["browser"])
+        mail = MockEmail(self.latencies["email"])
+        payments = MockPayments(self.latencies["payments"])
+        memory = MockMemory(self.latencies["memory"])
+        verifier = GoalVerifier(sandbox_config, payments_tool=payments, email_tool=mail, http_client=self.http)
+        return browser, mail, payments, memory, verifier
+
+
+def _windows(samples: list[dict[str, Any]], size: int) -> list[dict[str, Any]]:
+    """Throughput and memory per ``size``-step window, as the history grows."""
+    rows = []
+    for start in range(0, len(samples) - 1, size):
+        chunk = samples[start:start + size + 1]
+        if len(chunk) < 2:
+            break
+        elapsed = chunk[-1]["time"] - chunk[0]["time"]
+        rows.append({
+            "steps": f"{chunk[0]['step']}-{chunk[-1]['step']}",
+            "steps_per_sec": round((len(chunk) - 1) / elapsed, 1) if elapsed > 0 else None,
+            "messages": chunk[-1]["messages"],
+            "history_chars": chunk[-1]["history_chars"],
+            "rss_mb": round(chunk[-1]["rss_mb"], 1),
+            "events_per_step": round((chunk[-1]["events"] - chunk[0]["events"]) / (len(chunk) - 1), 2),
+        })
+    return rows
+
+
+async def run_benchmark(
+    steps: int = 200,
+    scenario: str = "overhead",
+    time_scale: float = 1.0,
+    window: int = 50,
+    seed: int = 0,
+    sandbox_config: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Run ``steps`` agent steps against mocks and return the report dict."""
+    latencies = {
+        name: Latency(median * time_scale, seed=seed + i)
+        for i, (name, median) in enumerate(SCENARIOS[scenario].items())
+    }
+    resources = BenchResources(latencies, seed=seed)
+    bridge = MockBridge(latencies["bridge"])
+    agent_runner._bridge = bridge
+    for key in resources.router.PROVIDER_MODULES:
+        resources.router.get(key).bridge = bridge
+
+    workdir = tempfile.mkdtemp(prefix="loop-bench-")
+    config = {
+        "sandbox_id": "bench",
+        "goal": "Grow the mock account to 1000 followers",
+        "goal_type": "general",
+        "target_value": 10**9,
+        "model": "claude-sonnet",
+        "time_limit": 10**9,
+        "initial_credits": steps,
+        "max_step_delay": 0.0,
+        "metrics_interval": 10**9,
+        "checkpoint_path": os.path.join(workdir, "checkpoint.jsonl"),
+        "result_store_path": os.path.join(workdir, "results"),
+        **(sandbox_config or {}),
+    }
+
+    started = time.perf_counter()
+    await agent_runner.run_agent(config, shared=resources)
+    wall = time.perf_counter() - started
+    # Every provider the run could think on, then the first think of each loop step.
+    providers = {id(p): p for p in (resources.router.get(key) for key in resources.router.PROVIDER_MODULES)}
+    first_thinks: dict[int, dict[str, Any]] = {}
+    for sample in sorted((s for p in providers.values() for s in p.samples), key=lambda s: s["time"]):
+        first_thinks.setdefault(sample["step"], sample)
+    samples = list(first_thinks.values())
+
+    # run_agent pushes its final phase histograms as a "metrics" event.
+    phases = bridge.phases
+    # Steps as the loop counts them: one cost event per completed step.
+    done = bridge.events["cost"]
+    # Steady state: think-to-think interval, which leaves out startup and
+    # shutdown. Memory writes run in the background, off the critical path.
+    steady = (samples[-1]["time"] - samples[0]["time"]) / (len(samples) - 1) if len(samples) > 1 else wall
+    injected = sum(lat.total for name, lat in latencies.items() if name != "memory")
+    step_mean = phases.get("step", {}).get("mean", steady)
+    return {
+        "scenario": scenario,
+        "time_scale": time_scale,
+        "steps": done,
+        "wall_seconds": round(wall, 3),
+        "steps_per_sec": round(1 / steady, 1) if steady > 0 else None,
+        "step_mean_ms": round(step_mean * 1000, 3),
+        # Mock latency is summed over all calls, which overstates the wait when
+        # calls overlap; this is exact for the zero-latency scenario and a
+        # lower bound otherwise.
+        "overhead_per_step_ms": round(max(0.0, steady - injected / max(done, 1)) * 1000, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "events": dict(_event_counts(bridge)),
+        "bridge_calls": dict(bridge.calls),
+        "windows": _windows(samples, window),
+        "phases": {k: v for k, v in phases.items() if v.get("count")},
+    }
+
+
+def _event_counts(bridge: MockBridge) -> Counter[str]:
+    events = Counter(bridge.events)
+    events["total"] = sum(bridge.events.values())
+    return events
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    print(f"scenario={report['scenario']} time_scale={report['time_scale']} steps={report['steps']}")
+    print(f"  steps/sec           {report['steps_per_sec']} (wall {report['wall_seconds']}s)")
+    print(f"  step mean           {report['step_mean_ms']} ms")
+    print(f"  overhead per step   {report['overhead_per_step_ms']} ms")
+    print(f"  peak RSS            {report['peak_rss_mb']} MB")
+    print(f"  events              {report['events']}")
+    print("  window         steps/sec  messages  history_chars  rss_mb  events/step")
+    for row in report["windows"]:
+        print(f"  {row['steps']:<14} {row['steps_per_sec']!s:<10} {row['messages']:<9} "
+              f"{row['history_chars']:<14} {row['rss_mb']:<7} {row['events_per_step']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="overhead")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiply every mock latency by this (e.g. 0.01 for CI)")
+    parser.add_argument("--window", type=int, default=50, help="Steps per reporting window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pipeline", action="store_true", help="Enable pipeline_steps")
+    parser.add_argument("--stream", action="store_true", help="Enable stream_reasoning")
+    parser.add_argument("--cascade", action="store_true", help="Enable the cheap-model cascade")
+    parser.add_argument("--summarize", action="store_true", help="Enable summarize_history")
+    parser.add_argument("--json", help="Also write the report to this file")
+    parser.add_argument("--max-overhead-ms", type=float,
+                        help="Exit non-zero if overhead per step exceeds this (CI gate)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(
+        steps=args.steps,
+        scenario=args.scenario,
+        time_scale=args.time_scale,
+        window=args.window,
+        seed=args.seed,
+        sandbox_config={
+            "pipeline_steps": args.pipeline,
+            "stream_reasoning": args.stream,
+            "cascade": args.cascade,
+            "summarize_history": args.summarize,
+        },
+    ))
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.max_overhead_ms is not None and report["overhead_per_step_ms"] > args.max_overhead_ms:
+        print(f"FAIL: overhead {report['overhead_per_step_ms']} ms/step > {args.max_overhead_ms} ms")
+        sys.exit(1)
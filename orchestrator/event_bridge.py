@@ -4,11 +4,16 @@ This is the shared interface between Track A (agent) and Track B (Convex).
 Track B implements this; Track A imports and calls it.
 """
 
+import asyncio
 import json
+import logging
+import time
 from typing import Any
 
 import httpx
 
+logger = logging.getLogger(__name__)
+
 
 class EventBridge:
     """Thin client for pushing agent events into Convex."""
@@ -126,3 +131,132 @@ class EventBridge:
 
     async def close(self) -> None:
         await self.client.aclose()
+
+
+class BufferedEventBridge(EventBridge):
+    """EventBridge that batches events into one Convex mutation per flush.
+
+    - Events are buffered and sent together via ``events:pushBatch`` every
+      ``flush_interval`` seconds, or sooner once ``max_batch`` are pending.
+    - A buffered ``status`` or partial ``thinking`` event is replaced in place
+      by a newer one of the same type for the same sandbox, so it never moves
+      behind events buffered after it. Progress updates only keep the latest
+      value that differs from the last one sent.
+    - Events in ``PRIORITY_EVENT_TYPES`` and sandbox completion flush at once.
+    """
+
+    PRIORITY_EVENT_TYPES = frozenset({"payment"})
+    COALESCED_EVENT_TYPES = frozenset({"status", "thinking"})
+
+    def __init__(
+        self,
+        convex_url: str,
+        convex_deploy_key: str,
+        flush_interval: float = 0.5,
+        max_batch: int = 100,
+        max_buffer: int = 5000,
+    ):
+        super().__init__(convex_url, convex_deploy_key)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_buffer = max_buffer
+        self._events: list[dict[str, Any]] = []
+        self._progress: dict[str, float] = {}
+        self._sent_progress: dict[str, float] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    async def push_event(
+        self, sandbox_id: str, event_type: str, payload: dict[str, Any]
+    ) -> None:
+        """Buffer an event; priority events are flushed before returning."""
+        event = {
+            "sandboxId": sandbox_id,
+            "eventType": event_type,
+            "payload": json.dumps(payload, default=str),
+            "timestamp": int(time.time() * 1000),
+        }
+        index = self._coalesced_index(event) if event_type in self.COALESCED_EVENT_TYPES else None
+        if index is None:
+            self._events.append(event)
+        else:
+            self._events[index] = event
+
+        if event_type in self.PRIORITY_EVENT_TYPES:
+            await self.flush()
+        else:
+            self._schedule()
+
+    async def update_progress(self, sandbox_id: str, progress: float) -> None:
+        """Buffer a progress update, skipping values Convex already has."""
+        if self._sent_progress.get(sandbox_id) == progress:
+            self._progress.pop(sandbox_id, None)
+            return
+        self._progress[sandbox_id] = progress
+        self._schedule()
+
+    async def complete_sandbox(self, sandbox_id: str, outcome: str) -> None:
+        await self.flush()
+        await super().complete_sandbox(sandbox_id, outcome)
+
+    async def flush(self) -> bool:
+        """Send everything buffered. Returns False if a batch failed and was requeued."""
+        async with self._flush_lock:
+            while self._events or self._progress:
+                events, self._events = self._events[:self.max_batch], self._events[self.max_batch:]
+                progress, self._progress = self._progress, {}
+                try:
+                    await self._call_mutation("events:pushBatch", {
+                        "events": events,
+                        "progress": [
+                            {"sandboxId": sid, "progress": value}
+                            for sid, value in progress.items()
+                        ],
+                    })
+                except Exception as e:
+                    logger.warning("Event batch flush failed (%d events): %s", len(events), e)
+                    self._requeue(events, progress)
+                    return False
+                self._sent_progress.update(progress)
+        return True
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        try:
+            await self.flush()
+        finally:
+            await super().close()
+
+    def _coalesced_index(self, event: dict[str, Any]) -> int | None:
+        """Index of the buffered event ``event`` replaces, so it keeps that place in order."""
+        for i, buffered in enumerate(self._events):
+            if buffered["sandboxId"] == event["sandboxId"] and buffered["eventType"] == event["eventType"]:
+                return i
+        return None
+
+    def _requeue(self, events: list[dict[str, Any]], progress: dict[str, float]) -> None:
+        self._events = events + self._events
+        if len(self._events) > self.max_buffer:
+            dropped = len(self._events) - self.max_buffer
+            self._events = self._events[dropped:]
+            logger.warning("Event buffer full — dropped %d oldest events", dropped)
+        self._progress = {**progress, **self._progress}
+
+    def _schedule(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self._events) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while self._events or self._progress:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.flush_interval * 4)
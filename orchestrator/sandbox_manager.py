@@ -25,11 +25,26 @@ ORCHESTRATOR_DIR = Path(__file__).resolve().parent
 
 AGENT_FILES = [
     "agent_runner.py",
+    "agent_host.py",
     "base.py",
+    "cassette.py",
+    "checkpoint.py",
+    "deadline.py",
     "model_router.py",
     "prompts.py",
+    "streaming.py",
     "goal_verifier.py",
+    "hedging.py",
+    "history.py",
+    "loop_detector.py",
     "memory.py",
+    "metrics.py",
+    "pacing.py",
+    "planning.py",
+    "pricing.py",
+    "results.py",
+    "summary.py",
+    "tracing.py",
     "requirements.txt",
     "providers/__init__.py",
     "providers/anthropic_provider.py",
@@ -156,15 +171,43 @@ class SandboxManager:
         )
         logger.info("pip install exit code: %s", getattr(result, "exit_code", "?"))
 
-    async def _start_agent(self, sandbox: Any, env_vars: dict[str, str]) -> None:
+    async def _start_agent(self, sandbox: Any, env_vars: dict[str, str], resume: bool = False) -> None:
         """Start agent_runner.py in background inside the sandbox."""
         cmd = (
             "cd /home/daytona/agent && "
             "nohup python agent_runner.py --config /home/daytona/config.json "
-            "> /home/daytona/agent.log 2>&1 &"
+            + ("--resume >> " if resume else "> ")
+            + "/home/daytona/agent.log 2>&1 &"
         )
         await sandbox.process.exec(cmd, env=env_vars)
-        logger.info("Agent process started in sandbox")
+        logger.info("Agent process %s in sandbox", "resumed" if resume else "started")
+
+    async def restart_agent(self, daytona_sandbox_id: str) -> None:
+        """Restart a dead agent process from its last checkpoint.
+
+        The environment is not rebuilt: agent_runner.py loads the .env that
+        ``_upload_env`` wrote when the sandbox was created.
+        """
+        daytona = await self._get_client()
+        sandbox = await daytona.get(daytona_sandbox_id)
+        await self._start_agent(sandbox, {}, resume=True)
+
+    async def recover_agent(self, daytona_sandbox_id: str) -> str:
+        """Resume the agent if it died mid-run.
+
+        Returns "running" if the process is alive, "finished" if it exited
+        cleanly (a finished run deletes its checkpoint), or "restarted".
+        """
+        if await self.is_agent_running(daytona_sandbox_id):
+            return "running"
+        daytona = await self._get_client()
+        sandbox = await daytona.get(daytona_sandbox_id)
+        result = await sandbox.process.exec("ls /home/daytona/agent/checkpoint-*.jsonl")
+        if getattr(result, "exit_code", 1) != 0:
+            return "finished"
+        await self._start_agent(sandbox, {}, resume=True)
+        logger.warning("Agent in sandbox %s had died — resumed from checkpoint", daytona_sandbox_id)
+        return "restarted"
 
     async def get_agent_logs(self, daytona_sandbox_id: str, tail: int = 100) -> str:
         """Read agent logs from the sandbox."""
@@ -193,3 +236,49 @@ class SandboxManager:
         if self._daytona is not None:
             await self._daytona.close()
             self._daytona = None
+
+
+class AgentWatchdog:
+    """Background task that resumes crashed agents in launched sandboxes."""
+
+    def __init__(self, manager: SandboxManager, interval: float = 60.0):
+        self._manager = manager
+        self._interval = interval
+        self._sandboxes: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    def watch(self, daytona_sandbox_id: str) -> None:
+        self._sandboxes.add(daytona_sandbox_id)
+
+    def start(self):
+        """Start the background watchdog loop."""
+        self._task = asyncio.create_task(self._run_loop())
+        logger.info("AgentWatchdog started")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run_loop(self):
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Watchdog loop error: %s", e)
+
+    async def _tick(self):
+        for daytona_sandbox_id in list(self._sandboxes):
+            try:
+                status = await self._manager.recover_agent(daytona_sandbox_id)
+            except Exception as e:
+                logger.warning("Failed to check agent in sandbox %s: %s", daytona_sandbox_id, e)
+                continue
+            if status == "finished":
+                self._sandboxes.discard(daytona_sandbox_id)
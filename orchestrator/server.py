@@ -24,7 +24,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from goal_extractor import extract_goal
 from judge import JudgeScheduler
-from sandbox_manager import SandboxManager
+from sandbox_manager import AgentWatchdog, SandboxManager
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -56,13 +56,16 @@ for _key in [*ENV_KEYS_TO_FORWARD, "DAYTONA_API_KEY", "DAYTONA_API_URL"]:
 
 _manager: SandboxManager | None = None
 _judge: JudgeScheduler | None = None
+_watchdog: AgentWatchdog | None = None
 
 
 @asynccontextmanager
 async def lifespan(application: FastAPI):
-    global _manager, _judge
+    global _manager, _judge, _watchdog
     _manager = SandboxManager()
     logger.info("SandboxManager initialized")
+    _watchdog = AgentWatchdog(_manager)
+    _watchdog.start()
 
     convex_url = os.environ.get("CONVEX_URL", "")
     convex_key = os.environ.get("CONVEX_DEPLOY_KEY", "")
@@ -73,6 +76,8 @@ async def lifespan(application: FastAPI):
 
     yield
 
+    if _watchdog:
+        await _watchdog.stop()
     if _judge:
         await _judge.stop()
         logger.info("JudgeScheduler stopped")
@@ -154,6 +159,8 @@ async def launch_sandbox(req: LaunchRequest) -> LaunchResponse:
         "account_handle": extracted.account_handle,
         "agentmail_inbox_id": inbox_id,
         "paylocus_wallet_id": "",
+        # Challenge sandboxes compare models, so the agent must not cascade to another one.
+        "head_to_head": bool(config_overrides.get("headToHead", False)),
         **config_overrides,
     }
 
@@ -166,6 +173,8 @@ async def launch_sandbox(req: LaunchRequest) -> LaunchResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
     logger.info("Sandbox %s launched as Daytona %s", req.sandboxId, daytona_id)
+    if _watchdog is not None:
+        _watchdog.watch(daytona_id)
 
     return LaunchResponse(
         daytonaSandboxId=daytona_id,
@@ -175,6 +184,19 @@ async def launch_sandbox(req: LaunchRequest) -> LaunchResponse:
     )
 
 
+@app.post("/sandboxes/{daytona_sandbox_id}/recover")
+async def recover_sandbox(daytona_sandbox_id: str):
+    """Resume the agent from its checkpoint if its process has died."""
+    if _manager is None:
+        raise HTTPException(status_code=503, detail="Server not ready")
+    try:
+        status = await _manager.recover_agent(daytona_sandbox_id)
+    except Exception as e:
+        logger.exception("Agent recovery failed for %s", daytona_sandbox_id)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": status}
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
@@ -81,6 +81,8 @@ async def launch_sandbox(
                 "goalDescription": sandbox_data["goalDescription"],
                 "model": sandbox_data["model"],
                 "timeLimit": sandbox_data["timeLimit"],
+                # Challenges pit two models against each other.
+                "config": {"head_to_head": True},
             },
             timeout=300,
         )
@@ -0,0 +1,6 @@
+"""Agent modules import each other by bare name, as they do inside the sandbox."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
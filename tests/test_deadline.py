@@ -0,0 +1,30 @@
+import asyncio
+
+from deadline import Deadline
+
+
+def test_a_held_payment_finishes_before_the_deadline_cancels():
+    async def run() -> list[str]:
+        deadline = Deadline(0.05, grace=1.0)
+        done: list[str] = []
+        async with deadline.scope():
+            deadline.hold()
+            await asyncio.sleep(0.2)
+            done.append("payment recorded")
+            deadline.release()
+            await asyncio.sleep(5)
+            done.append("ran past the deadline")
+        return done
+
+    assert asyncio.run(run()) == ["payment recorded"]
+
+
+def test_a_hold_lasts_at_most_the_grace_period():
+    async def run() -> bool:
+        deadline = Deadline(0.05, grace=0.1)
+        async with deadline.scope():
+            deadline.hold()
+            await asyncio.sleep(5)
+        return deadline.fired
+
+    assert asyncio.run(run())
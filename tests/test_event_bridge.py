@@ -0,0 +1,35 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("httpx")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "orchestrator"))
+
+from event_bridge import BufferedEventBridge
+
+
+def test_coalesced_event_keeps_its_place_in_the_buffer():
+    async def scenario():
+        bridge = BufferedEventBridge("https://example.convex.cloud", "key", flush_interval=60)
+        sent = []
+
+        async def call_mutation(name, args):
+            sent.extend(args["events"])
+
+        bridge._call_mutation = call_mutation
+        await bridge.push_event("s1", "status", {"status": "thinking"})
+        await bridge.push_event("s1", "action", {"tool": "send_email"})
+        await bridge.push_event("s1", "status", {"status": "acting"})
+        await bridge.push_event("s2", "status", {"status": "thinking"})
+        await bridge.flush()
+        await bridge.close()
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert [(e["sandboxId"], e["eventType"]) for e in sent] == [
+        ("s1", "status"), ("s1", "action"), ("s2", "status"),
+    ]
+    assert json.loads(sent[0]["payload"]) == {"status": "acting"}
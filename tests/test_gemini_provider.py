@@ -0,0 +1,51 @@
+from collections.abc import Mapping, Sequence
+from types import SimpleNamespace
+
+from base import ToolCall
+from planning import parse_plan
+from providers.gemini_provider import _to_tool_call
+
+
+class FakeMapComposite(Mapping):
+    """Stands in for proto.marshal's MapComposite: a Mapping, not a dict."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FakeRepeatedComposite(Sequence):
+    """Stands in for proto.marshal's RepeatedComposite: a Sequence, not a list."""
+
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def test_nested_function_args_become_plain_dicts_and_lists():
+    args = FakeMapComposite({
+        "steps": FakeRepeatedComposite([
+            FakeMapComposite({"tool": "browser_task", "arguments": '{"task": "Open the shop"}'}),
+            FakeMapComposite({"tool": "fetch_result", "arguments": '{"ref": "r:ab12"}', "guard": "always"}),
+        ]),
+    })
+    call = _to_tool_call(SimpleNamespace(name="submit_plan", args=args))
+
+    assert type(call.input["steps"]) is list
+    assert all(type(step) is dict for step in call.input["steps"])
+    steps, error = parse_plan(ToolCall(id="p", name=call.name, input=call.input), max_steps=5)
+    assert error is None
+    assert [s.call.name for s in steps] == ["browser_task", "fetch_result"]
@@ -0,0 +1,49 @@
+import asyncio
+import time
+
+from base import BaseProvider, Decision
+from hedging import HedgePolicy
+
+
+class Provider(BaseProvider):
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+
+
+def _attempt(cancelled: list[str]):
+    async def attempt(provider: Provider, is_primary: bool) -> Decision:
+        try:
+            await asyncio.sleep(provider.latency)
+        except asyncio.CancelledError:
+            cancelled.append(provider.name)
+            raise
+        return Decision(reasoning=provider.name, action_type="finish_reasoning", action={}, cost=0.01)
+    return attempt
+
+
+def test_a_hedge_starts_once_a_slot_frees_up():
+    async def run() -> tuple[str, float, list[str]]:
+        policy = HedgePolicy(max_in_flight=1, default_delay=0.05, min_delay=0.05)
+        # Another agent holds the only hedge slot for a moment.
+        await policy._slots.acquire()
+        asyncio.get_running_loop().call_later(0.15, policy._slots.release)
+        cancelled: list[str] = []
+        started = time.perf_counter()
+        decision = await policy.race([Provider("slow", 2.0), Provider("fast", 0.01)], _attempt(cancelled))
+        return decision.reasoning, time.perf_counter() - started, cancelled
+
+    winner, elapsed, cancelled = asyncio.run(run())
+    assert winner == "fast"
+    assert elapsed < 1.0
+    # The loser was cancelled and had settled before race returned.
+    assert cancelled == ["slow"]
+
+
+def test_the_slot_is_returned_after_the_race():
+    async def run() -> bool:
+        policy = HedgePolicy(max_in_flight=1, default_delay=0.05, min_delay=0.05)
+        await policy.race([Provider("slow", 2.0), Provider("fast", 0.01)], _attempt([]))
+        return policy._slots.locked()
+
+    assert asyncio.run(run()) is False
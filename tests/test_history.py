@@ -0,0 +1,27 @@
+import json
+
+from history import HistoryTrimmer
+
+
+def _turn(i: int, result: str) -> list[dict]:
+    return [
+        {"role": "user", "content": f"Step {i}: keep going"},
+        {"role": "assistant", "content": [{"type": "tool_use", "id": f"t{i}", "name": "browser_task", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": f"t{i}", "content": result}]},
+    ]
+
+
+def test_an_oversized_turn_is_shrunk_to_the_budget_with_a_dense_tokenizer():
+    # 2 chars per token: a fixed 4-chars-per-token estimate would leave the turn twice over budget.
+    def count_tokens(text: str) -> int:
+        return len(text) // 2 + 1
+
+    trimmer = HistoryTrimmer(count_tokens, context_window=10_000, fraction=1.0,
+                             reserve_tokens=0, chars_per_token=2.0)
+    messages = [{"role": "user", "content": "Goal"}] + _turn(1, json.dumps({"page": "x" * 60_000}))
+
+    trimmed = trimmer.trim(messages)
+
+    # Within rounding of the budget (the old fixed estimate left it about twice over).
+    assert trimmer.total(trimmed) <= trimmer.budget * 1.01
+    assert "truncated" in trimmed[-1]["content"][0]["content"]
@@ -0,0 +1,35 @@
+from loop_detector import LoopDetector
+
+TEMPLATE = (
+    "Hi there, I run a small newsletter about indie developer tools and would love "
+    "to feature your project in next week's issue. Could you reply with a short "
+    "description and a link? Thanks so much for your time and all the great work."
+)
+
+
+def _email(to: str) -> dict:
+    return {"to": to, "subject": "Feature in our newsletter", "body": TEMPLATE}
+
+
+def test_templated_sends_to_distinct_recipients_are_not_a_loop():
+    loops = LoopDetector()
+    for batch in (["alice@x.com", "bob@x.com", "carol@x.com"], ["dave@x.com", "erin@x.com", "fay@x.com"]):
+        for to in batch:
+            loops.record("send_email", _email(to), {"status": "sent"})
+        loops.end_step()
+        assert loops.hint() is None
+
+    assert loops.block_reason("send_email", _email("gus@y.com")) is None
+    assert not loops.repeats("send_email", _email("gus@y.com"))
+
+
+def test_repeated_send_to_the_same_recipient_is_a_loop():
+    loops = LoopDetector()
+    for _ in range(2):
+        for _ in range(3):
+            loops.record("send_email", _email("alice@x.com"), {"status": "sent"})
+        loops.end_step()
+
+    assert loops.hint() is not None
+    assert loops.repeats("send_email", _email("Alice@x.com "))
+    assert loops.block_reason("send_email", _email("alice@x.com")) is not None
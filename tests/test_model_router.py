@@ -0,0 +1,27 @@
+import time
+
+from base import BaseProvider
+from model_router import ModelRouter
+
+
+def _router() -> ModelRouter:
+    router = ModelRouter()
+    for key in router.PROVIDER_MODULES:
+        router.register(key, BaseProvider())
+    return router
+
+
+def test_a_half_open_fallback_gets_a_single_probe_across_chains():
+    router = _router()
+    health = router.health_of("gpt-4o")
+    for _ in range(health.failure_threshold):
+        health.record_failure()
+    health.opened_at = time.monotonic() - health.cooldown - 1
+    assert health.state == "half_open"
+
+    first = [p.model_key for p in router.get_fallback_chain("claude-sonnet")]
+    second = [p.model_key for p in router.get_fallback_chain("claude-sonnet")]
+
+    assert "gpt-4o" in first
+    assert "gpt-4o" not in second
+    assert second == ["claude-sonnet", "gemini-2-flash"]
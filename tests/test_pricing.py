@@ -0,0 +1,35 @@
+import pytest
+
+from pricing import CostLedger, result_cost
+
+
+def _locus_send(status: str) -> dict:
+    # Shape returned by PaymentsTool.send_usdc for an accepted Locus transfer.
+    return {
+        "status": status,
+        "transaction_id": "tx_123",
+        "from_address": "0xabc",
+        "to_address": "0xdef",
+        "amount": 5,
+        "memo": "bounty",
+        "approval_url": None,
+    }
+
+
+@pytest.mark.parametrize("status", ["QUEUED", "SUCCESS", "success", "Pending"])
+def test_accepted_transfers_are_charged(status):
+    ledger = CostLedger(budget_usd=20)
+    charge = result_cost("send_usdc", {"to_address": "0xdef", "amount": 5}, _locus_send(status))
+    assert charge == ("payments", 5.0)
+    ledger.charge(*charge, label="send_usdc")
+    assert ledger.by_phase() == {"payments": 5.0}
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "policy_rejected", "error": "Policy limit reached", "email": "a@b.com", "amount": 5},
+    {"status": "error", "error": "timeout", "email": "a@b.com", "amount": 5},
+    {"status": "blocked", "error": "constraint"},
+    {"status": "FAILED", "transaction_id": "tx_9"},
+])
+def test_rejected_transfers_are_not_charged(result):
+    assert result_cost("send_usdc_email", {"email": "a@b.com", "amount": 5}, result) is None
@@ -0,0 +1,27 @@
+import json
+
+from results import ResultCompactor, ResultStore
+
+
+def test_paging_a_large_structured_result_returns_every_byte(tmp_path):
+    compactor = ResultCompactor(ResultStore(str(tmp_path)), chars_per_token=3.5)
+    output = {
+        "status": "success",
+        "items": [{"name": f"item {i}", "note": 'quoted "text"\n\twith escapes'} for i in range(400)],
+    }
+    summary = compactor.compact("browser_task", output)
+    assert "_ref" in summary
+
+    original = json.dumps(output, default=str, indent=1)
+    pages: list[str] = []
+    offset = 0
+    while offset is not None:
+        page = compactor.fetch({"ref": summary["_ref"], "offset": offset})
+        assert len(json.dumps(page, default=str)) <= compactor.budget_chars("fetch_result")
+        # Pages fit the budget, so compaction passes them through untouched.
+        assert compactor.compact("fetch_result", page) is page
+        pages.append(page["content"])
+        offset = page["next_offset"]
+
+    assert len(pages) > 1
+    assert "".join(pages) == original
@@ -0,0 +1,12 @@
+from tools.schemas import validate_tool_call
+
+
+def test_whole_number_floats_are_accepted_as_integers():
+    arguments = {"ref": "r:abc123", "offset": 6000.0}
+    assert validate_tool_call("fetch_result", arguments) is None
+    assert arguments["offset"] == 6000
+    assert isinstance(arguments["offset"], int)
+
+
+def test_fractional_floats_are_not_integers():
+    assert validate_tool_call("fetch_result", {"ref": "r:abc123", "offset": 10.5}) is not None